@@ -8,38 +8,163 @@
 #    who = the current player 'o' or 'x'
 #    other = the other player 'x' or 'o'
 #
+#  The search is iterative deepening: it searches 1, 2, 3... plies deep
+#  until the per-move budget runs out and plays the best move of the last
+#  completed iteration.  The budget is time_limit seconds and, if given,
+#  node_limit nodes; max_depth caps the depth.  The first iteration
+#  always completes so there is always a move to play.  Each iteration
+#  is a negamax principal variation search inside an aspiration window
+#  around the previous iteration's score.
+#
+#  With workers > 1 the search runs in that many processes sharing one
+#  transposition table (Lazy SMP, see konanesmp).
+#
+#  If the endgame database file egtb (konane.egtb next to this file by
+#  default) exists, positions found in it are scored exactly without
+#  searching below them.
+#
+#  While the position is in the opening book (konane.book next to this
+#  file by default, built by konanebook), move() plays the book move
+#  without searching.
+#
+#  ponder() starts searching in a background thread while the opponent
+#  thinks: it guesses the opponent's reply (the best move the
+#  transposition table has for them) and searches our answer to it.  The
+#  next move() stops it.  If the guess was right, the pondered search
+#  counts towards this move's time and carries on for whatever is left
+#  of time_limit; if not, everything it stored in the transposition table
+#  is still there for the real search.
+#
+#  With batch_leaves=True the nodes one ply above the leaves evaluate
+#  all their children together (konanebatch.Mobility, with NumPy) instead
+#  of visiting each.
+#
+#  With stats=True every move searched here leaves a
+#  konanestats.SearchStats in self.stats describing the search.  After
+#  a book move, a ponder hit or a parallel search, and with stats=False,
+#  self.stats is None.
+#
+import os.path
 import random
-import konaneutils as U
+import threading
+import time
+import konanebits as U
+import konanett as T
+import konaneorder as O
+import konanesmp as S
+import konanestats as K
+import konaneegtb as E
+import konanebook as B
+import konanebatch as KB
+import konaneevents as EV
+
+TIME_LIMIT = 1.0
+MAX_DEPTH = 64
+WIN = 100000000
+# Beyond any score, so that a full window (-INF, INF) has +/- WIN inside it
+INF = WIN + 1
+# Half width of the first aspiration window, in evaluation units (moves)
+ASPIRATION = 1
+# Fewest leaves worth a batched evaluation (batch_leaves=True)
+BATCH_LEAVES = 6
+EGTB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'konane.egtb')
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'konane.book')
+
+class SearchTimeout(Exception):
+    pass
 
 class Konane:
-    def __init__(self, board, who):
+    def __init__(self, board, who, time_limit=TIME_LIMIT, node_limit=None,
+                 max_depth=MAX_DEPTH, workers=1, stats=False, egtb=EGTB_FILE,
+                 book=BOOK_FILE, batch_leaves=False):
         self.board = board
         self.who = who
         self.other = {'x':'o', 'o':'x'}[who]
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.workers = workers
+        self.collectStats = stats
+        # The rest of the constructor's arguments, for konanesmp to build
+        # its workers' players with
+        self.settings = {'stats': stats, 'egtb': egtb, 'book': book,
+                         'batch_leaves': batch_leaves}
+        # Both files hold standard 8x8 positions only
+        self.egtb = None
+        if egtb and os.path.exists(egtb) and len(board) == U.SIZE:
+            self.egtb = E.EndgameTable(egtb)
+        self.book = None
+        if book and os.path.exists(book) and len(board) == U.SIZE:
+            self.book = B.OpeningBook(book)
+        self.stats = None
+        # Kept between moves: positions from the last search often recur
+        if workers > 1:
+            self.tt = T.SharedTranspositionTable(size=len(board))
+        else:
+            self.tt = T.TranspositionTable()
+        # Set by the Lazy SMP workers: an event that ends the search, the
+        # iteration to start at, and a seed for shuffling the root moves
+        self.stop = None
+        self.startDepth = 0
+        self.seed = None
+        self.order = O.MoveOrder(size=len(board))
+        self.mobility = KB.Mobility(len(board)) if batch_leaves else None
+        # The pondering thread, the key of the position it searches (ours
+        # to move), when it started and what it found
+        self.ponderThread = None
+        self.ponderKey = None
+        self.ponderStart = 0.0
+        self.pondered = None
    
     #  Move command.  It should return a 4-tuple containing
     #  the move that it thinks is best for the 'who' player
     def move(self):
         # Optional debugging write
-        print("Score when move is called:" , self.simple_score(self.board))
+        if EV.level >= EV.DETAIL:
+            EV.emit(EV.DETAIL, 'score', who=self.who, score=self.simple_score(self.board))
 
-        # All possible moves I can make
-        mymoves = U.genmoves(self.board, self.who)
+        # All possible moves I can make, on a position that the search
+        # updates in place
+        pos = U.Position(self.board)
+        mymoves = pos.moves(self.who)
 
         # Optional for debugging: Print available moves
-        print("available moves")
-        for n in mymoves:
-            print(n.mover, "moves ", n.move)
+        if EV.level >= EV.DETAIL:
+            EV.emit(EV.DETAIL, 'available', who=self.who,
+                    moves=[pos.move_tuple(m) for m in mymoves])
 
         #--------------------------------------------------------------------------------------
         # YOUR CODE REPLACES THIS SECTION
 
+        pondered = self.stop_pondering(pos.key(self.who))
+        # Until this move's search makes new ones
+        self.stats = None
 
-        who = self.who
-        board = self.board
-        newMoves = [(self.minimax(who, n, -1000, 1000, 0, 3), n.move) for n in mymoves]
+        if self.book:
+            found = self.book.probe(pos, self.who)
+            if found and found[0] in mymoves:
+                move, depth, score = found
+                EV.emit(EV.MOVE, 'book', who=self.who, move=pos.move_tuple(move),
+                        depth=depth, score=score)
+                return pos.move_tuple(move)
 
-        newMoves = sorted(newMoves)
+        if pondered:
+            scored = pondered
+            EV.emit(EV.SEARCH, 'ponder', who=self.who, hit=True, depth=self.depth)
+        elif self.workers > 1:
+            scored, depth, nodes, reports = S.search(self, self.workers)
+            for worker, depth, nodes, tt in reports:
+                EV.emit(EV.SEARCH, 'worker', worker=worker, depth=depth, nodes=nodes,
+                        tt=tt)
+        else:
+            if self.collectStats:
+                self.stats = K.SearchStats()
+                before = self.tt.stats()
+            scored = self.deepen(pos, mymoves)
+            if self.stats:
+                self.stats.finish(self.tt, before)
+                EV.emit(EV.SEARCH, 'stats', who=self.who, stats=self.stats.as_dict())
+        newMoves = [(score, pos.move_tuple(m)) for score, m in scored]
 
         #
         #random.shuffle(mymoves)          # Use this to pick a random move
@@ -53,16 +178,18 @@ class Konane:
         #movesWithScore = sorted(movesWithScore)
 
         # Optional for debugging: print all the available moves with their scores
-        for ms in newMoves:
-            print("Score: ", ms)
+        EV.emit(EV.DETAIL, 'scores', who=self.who, scores=newMoves)
 
-        # Extract the move from the tuple at the end of the list (highest score)
+        # Extract the move from the tuple at the front of the list (highest score)
         
-        score, mymove = newMoves[-1]
+        score, mymove = newMoves[0]
         #random.shuffle(mymoves) 
         #mymove = mymoves[-1].move 
         #score, extra = nodeWithScore
-        print(self.who, "picked move", mymove, "with score", score)
+        EV.emit(EV.MOVE, 'move', who=self.who, move=mymove, score=score)
+        if self.workers == 1 and EV.level >= EV.SEARCH:
+            EV.emit(EV.SEARCH, 'tables', who=self.who, tt=self.tt.stats(),
+                    cutoffs=self.order.cutoffs, firstMove=self.order.first_move_rate())
         #
         # YOUR CODE ENDS HERE
         #-------------------------------------------------------------------------
@@ -84,48 +211,335 @@ class Konane:
     #
     # YOU MIGHT HAVE A MORE SOPHISTICATED SCORING FUNCTION
     #
+    # Both count moves without generating them.
     def simple_score(self, board):
-        return len(U.genmoves(board, self.who)) - len(U.genmoves(board, self.other))
+        return U.count_moves(board, self.who) - U.count_moves(board, self.other)
 
-    def simple_score2(self, board):
-        a = len(U.genmoves(board, self.who))
-        b = len(U.genmoves(board, self.other))
-        if a == 0:
-            return -100000000
-        if b == 0:
-            return 100000000
-        return a - b    
+    # The search's leaf score.  It stays well inside +/- WIN even when a
+    # side has no jump, since the side to move can still open lines with
+    # its move; only negamax's terminal nodes are won or lost.
+    def simple_score2(self, pos):
+        return pos.count(self.who) - pos.count(self.other)
 
         
 
     def gameDone(self, mover):
         return U.gameDone(self.board, mover)
 
+    # Start thinking on the opponent's time.  Call it with the opponent to
+    # move on self.board; it returns at once.  The search works on its own
+    # copy of the position, so the board may change while it runs.
+    def ponder(self):
+        if self.workers > 1 or self.ponderThread: return
+        pos = U.Position(self.board)
+        replies = pos.moves(self.other)
+        if not replies: return
+        entry = self.tt.probe(pos.key(self.other))
+        guess = entry[3] if entry and entry[3] in replies else \
+                self.order.order(replies, 0)[0]
+        pos.make(self.other, guess)
+        key = pos.key(self.who)
+        mymoves = pos.moves(self.who)
+        if not mymoves: return
+        if self.book and self.book.probe(pos, self.who): return
+        self.stats = None
+        self.stop = threading.Event()
+        self.ponderKey = key
+        self.ponderStart = time.time()
+        self.pondered = None
+        self.ponderThread = threading.Thread(target=self._ponder, args=(pos, mymoves),
+                                             daemon=True)
+        self.ponderThread.start()
+
+    def _ponder(self, pos, mymoves):
+        scored = self.deepen(pos, mymoves, ponder=True)
+        if self.depth: self.pondered = scored
+
+    # Stop pondering.  key is the position we now have to move in; if it
+    # is the one pondered, the search is given the rest of time_limit and
+    # its result returned, otherwise None.
+    def stop_pondering(self, key):
+        thread = self.ponderThread
+        if not thread: return None
+        if key == self.ponderKey:
+            thread.join(max(0.0, self.time_limit - (time.time() - self.ponderStart)))
+        self.stop.set()
+        thread.join()
+        self.ponderThread = None
+        self.stop = None
+        if key == self.ponderKey: return self.pondered
+        return None
+
 
 
-    def minimax(self, who, board, alpha, beta, r, depth):
-        loop = depth
-        if r == loop or self.gameDone(who):
-            return self.simple_score2(board.b)
-        mymoves = U.genmoves(board.b, who)
-        integer = 5
-        if who == self.who:
-            for ms in mymoves:
-                s = r + 1
-                childScore = self.minimax(self.other, ms, alpha, beta, s, depth)
-                setMoveScore = max(childScore, alpha)
-                alpha = setMoveScore
-                integer = alpha
-                if alpha >= beta: break
+    # Iterative deepening.  Each iteration searches the root moves in the
+    # order the previous iteration ranked them, and the transposition
+    # table hands every interior node its previous best move, so each
+    # iteration starts down the last principal variation.
+    #
+    # Returns [(score, move), ...] of the last completed iteration, best
+    # first.  With ponder=True there is no time limit (the search runs
+    # until self.stop is set) and nothing is printed.
+    def deepen(self, pos, mymoves, ponder=False):
+        self.nodes = 0
+        self.depth = 0
+        self.order.new_search()
+        self.tt.new_search()
+        self.deadline = None
+        self.nodeBudget = None
+        start = time.time()
+        timeLimit = float('inf') if ponder else self.time_limit
+        scored = [(0, m) for m in mymoves]
+        if self.seed is not None:
+            random.Random(self.seed).shuffle(scored)
+        depth = self.startDepth
+        while depth < self.max_depth:
+            guess = scored[0][0] if depth > self.startDepth else None
+            try:
+                scored = self.search_root(pos, [m for s, m in scored], depth, guess)
+            except SearchTimeout:
+                break
+            depth += 1
+            self.depth = depth
+            if self.stats: self.stats.iteration(depth, self.nodes)
+            used = time.time() - start
+            if not ponder and EV.level >= EV.SEARCH:
+                EV.emit(EV.SEARCH, 'iteration', who=self.who, depth=depth,
+                        best=pos.move_tuple(scored[0][1]), score=scored[0][0],
+                        nodes=self.nodes, seconds=used)
+            if abs(scored[0][0]) >= WIN: break
+
+            # The next iteration takes several times longer than this
+            # one; don't start it unless there is time for most of it.
+            if used > timeLimit / 2: break
+            self.deadline = start + timeLimit
+            self.nodeBudget = self.node_limit
+        return scored
+
+    # Root of one iteration, searched with an aspiration window: guess is
+    # the previous iteration's best score, and the window starts
+    # ASPIRATION either side of it.  A best score outside the window
+    # only bounds the truth, so the window is widened on that side (four
+    # times as far each time) and the iteration searched again, starting
+    # with the move that failed high.  With no guess, or a won or lost
+    # guess, the window is the whole range.
+    def search_root(self, pos, mymoves, depth, guess=None):
+        if guess is None or abs(guess) >= WIN:
+            alpha, beta = -INF, INF
         else:
-            for ms in mymoves:
-                s = r + 1
-                childScore = self.minimax(self.who, ms, alpha, beta, s, depth)
-                setMoveScore = min(childScore, beta)
-                beta = setMoveScore
-                integer = beta
-                if beta <= alpha: break
-        return integer  
+            alpha, beta = guess - ASPIRATION, guess + ASPIRATION
+        delta = ASPIRATION
+        while 1:
+            scored = self.search_window(pos, mymoves, depth, alpha, beta)
+            best = scored[0][0]
+            if best <= alpha and alpha > -INF:
+                alpha = max(alpha - delta, -INF)
+            elif best >= beta and beta < INF:
+                beta = min(beta + delta, INF)
+            else:
+                return scored
+            delta *= 4
+            mymoves = [m for s, m in scored]
+
+    # Principal variation search at the root: the first move gets the
+    # (alpha, beta) window, the rest a null window that only asks
+    # whether they beat the best so far, and one that does is searched
+    # again with the full window.  Scores of moves that did not beat the
+    # best are upper bounds, which is all the ordering needs.
+    def search_window(self, pos, mymoves, depth, alpha, beta):
+        who, other = self.who, self.other
+        scored = []
+        for n, m in enumerate(mymoves):
+            pos.make(who, m)
+            if n == 0:
+                score = -self.negamax(other, pos, -beta, -alpha, 0, depth)
+            else:
+                score = -self.negamax(other, pos, -alpha - 1, -alpha, 0, depth)
+                if alpha < score < beta:
+                    score = -self.negamax(other, pos, -beta, -alpha, 0, depth)
+            pos.unmake(who, m)
+            scored.append((score, m))
+            if score > alpha: alpha = score
+            if alpha >= beta:
+                # Fail high: the rest will be searched again anyway
+                scored += [(-INF, m) for m in mymoves[n+1:]]
+                break
+        scored.sort(key=lambda sm: -sm[0])
+        return scored
 
+    def check_budget(self):
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout
+        if self.deadline and time.time() > self.deadline:
+            raise SearchTimeout
+        if self.nodeBudget and self.nodes >= self.nodeBudget:
+            raise SearchTimeout
 
-            
+    # Negamax alpha-beta over a Position: the score is from the point of
+    # view of 'who', the side to move, so one loop serves both players.
+    # Each move is made on the position, searched, and taken back, so no
+    # boards are copied.  r is the ply below the root's children, and the
+    # node is a leaf at r == depth.
+    #
+    # Principal variation search: the first (best ordered) move is
+    # searched with the full window and the others with a null window
+    # (alpha, alpha + 1), re-searched only if they turn out better.  The
+    # search is fail-soft, so a score outside the window is still the
+    # tightest bound found.
+    #
+    # Results are kept in the transposition table under the position's
+    # Zobrist key, scored for the side to move.  An entry searched at
+    # least as deep as needed answers the node outright when its bound
+    # allows; otherwise its best move is searched first.
+    #
+    # Before all that, positions in the endgame database are answered
+    # from it: +/- WIN for a win or loss for the side to move.  A side to
+    # move with no jump has lost, which is -WIN whichever side it is.
+    # With statistics on, st is the move's SearchStats; leaf evaluation and
+    # move generation are timed only then.
+    def negamax(self, who, pos, alpha, beta, r, depth):
+        self.nodes += 1
+        if self.nodes & 1023 == 0: self.check_budget()
+        st = self.stats
+        if st: st.nodes[r] += 1
+        key = pos.key(who)
+        egtb = self.egtb
+        if egtb and pos.pieces() <= egtb.maxPieces:
+            found = egtb.probe(pos.canonical_key(who)[0] if egtb.canonical else key)
+            if found:
+                if st: st.egtbHits += 1
+                return WIN if found[0] else -WIN
+        entry = self.tt.probe(key)
+        ttmove = None
+        if entry:
+            edepth, flag, score, ttmove = entry
+            if edepth >= depth - r:
+                if flag == T.EXACT: return score
+                if flag == T.LOWER and score >= beta: return score
+                if flag == T.UPPER and score <= alpha: return score
+        if not pos.has_move(who):
+            # The side to move has lost, whoever that is
+            self.tt.store(key, depth - r, T.EXACT, -WIN, None)
+            return -WIN
+        if r == depth:
+            if st:
+                t = time.perf_counter()
+                score = self.simple_score2(pos)
+                st.evalTime += time.perf_counter() - t
+                st.leaves += 1
+            else:
+                score = self.simple_score2(pos)
+            if who != self.who: score = -score
+            self.tt.store(key, depth - r, T.EXACT, score, None)
+            return score
+        if st:
+            t = time.perf_counter()
+            mymoves = self.order.order(pos.moves(who), r, ttmove)
+            st.genTime += time.perf_counter() - t
+        else:
+            mymoves = self.order.order(pos.moves(who), r, ttmove)
+        if self.mobility and r + 1 == depth:
+            return self.frontier(who, pos, mymoves, alpha, beta, r, depth, key)
+        other = U.OTHER[who]
+        origAlpha = alpha
+        best = -INF
+        bestMove = None
+        for n, m in enumerate(mymoves):
+            pos.make(who, m)
+            if n == 0:
+                score = -self.negamax(other, pos, -beta, -alpha, r + 1, depth)
+            else:
+                score = -self.negamax(other, pos, -alpha - 1, -alpha, r + 1, depth)
+                if alpha < score < beta:
+                    score = -self.negamax(other, pos, -beta, -alpha, r + 1, depth)
+            pos.unmake(who, m)
+            if score > best:
+                best = score
+                bestMove = m
+                if score > alpha: alpha = score
+                if alpha >= beta:
+                    self.order.cutoff(m, r, depth - r, n)
+                    if st: st.cutoff(r, n)
+                    break
+        if best <= origAlpha:
+            flag = T.UPPER
+        elif best >= beta:
+            flag = T.LOWER
+        else:
+            flag = T.EXACT
+        self.tt.store(key, depth - r, flag, best, bestMove)
+        return best
+
+    # A node whose children are all leaves.  The first (best ordered)
+    # child is scored on its own, since in most such nodes it causes a
+    # cutoff.  If it does not, every child will be needed, so the rest
+    # are scored together when there are at least BATCH_LEAVES of them:
+    # each child's bitboards are built from the move (the mover's pieces
+    # lose 'from' and gain 'to', the other side loses 'over') and both
+    # sides' jumps counted in all of them with one batched call.  Scores
+    # are those simple_score2 gives, except that a child where the
+    # opponent, to move there, has no jump is won; the children skip the
+    # endgame and transposition tables, which at depth 0 only save an
+    # evaluation.  The node's score is the one negamax would give it
+    # (konanebits.selftest checks), but fewer nodes are counted: negamax
+    # searches a leaf again when a null-window score lands inside the
+    # window, and here each leaf is scored once.
+    def frontier(self, who, pos, mymoves, alpha, beta, r, depth, key):
+        st = self.stats
+        if st: t = time.perf_counter()
+        sign = 1 if who == self.who else -1
+        origAlpha = alpha
+        best = -INF
+        bestMove = None
+        counts = None
+        for n, m in enumerate(mymoves):
+            if counts is None and n and len(mymoves) - n >= BATCH_LEAVES:
+                counts = self.leaf_counts(who, pos, mymoves[n:])
+                base = n
+            if counts:
+                a, b = counts[0][n - base], counts[1][n - base]
+            else:
+                pos.make(who, m)
+                a, b = pos.count(self.who), pos.count(self.other)
+                pos.unmake(who, m)
+            if (b if sign == 1 else a) == 0:
+                score = WIN
+            else:
+                score = sign * (a - b)
+            if score > best:
+                best = score
+                bestMove = m
+                if score > alpha: alpha = score
+                if alpha >= beta:
+                    self.order.cutoff(m, r, depth - r, n)
+                    if st: st.cutoff(r, n)
+                    break
+        n += 1
+        if st:
+            st.evalTime += time.perf_counter() - t
+            st.leaves += n
+            st.nodes[r + 1] += n
+        self.nodes += n
+        if self.nodes & 1023 < n: self.check_budget()
+        if best <= origAlpha:
+            flag = T.UPPER
+        elif best >= beta:
+            flag = T.LOWER
+        else:
+            flag = T.EXACT
+        self.tt.store(key, depth - r, flag, best, bestMove)
+        return best
+
+    # Jump counts of self.who and self.other after each of 'moves'
+    def leaf_counts(self, who, pos, moves):
+        other = U.OTHER[who]
+        mine, theirs = pos.bits[who], pos.bits[other]
+        moved = [mine ^ (1 << m[0]) ^ (1 << m[1]) for m in moves]
+        captured = [theirs ^ m[2] for m in moves]
+        if who == 'x':
+            xCounts, oCounts = self.mobility.counts(moved, captured)
+        else:
+            xCounts, oCounts = self.mobility.counts(captured, moved)
+        if self.who == 'x':
+            return xCounts, oCounts
+        return oCounts, xCounts
@@ -0,0 +1,211 @@
+# Batched Konane routines on NumPy arrays
+#
+#-------------------------------------------------------------------------
+# Python spends far longer deciding what to do with one board than the
+# arithmetic takes, so work that is repeated over many boards is done
+# here on all of them at once, as NumPy arrays.
+#
+# NumPy is optional.  HAVE_NUMPY says whether it was found; without it
+# every routine falls back to a plain loop over konanebits positions, so
+# callers work either way, only slower.
+#
+# Playouts: random games played to the end, many from one position at
+#           once, all advancing one ply per step.
+#
+# Mobility: the number of jumps each side has, for many positions at
+#           once; the leaf evaluation of a whole frontier node's children
+#           in one go.
+#
+# konanebits.selftest checks both against the one-position routines.
+#
+#------------------------------------------------------------------------------
+#
+import random
+import konanebits as U
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+#------------------------------------------------------------------------------
+#  Random playouts
+#
+#  Each game is a pair of uint64 bitboards, 'me' for the side to move and
+#  'you' for the other, so the games are two (games,) arrays and every
+#  konanebits operation (shift, AND, popcount) works on all of them in
+#  one NumPy call.  Per step:
+#
+#     for each direction and hop count (a 'group'), the mask of pieces
+#     with that jump, exactly as in konanebits.bitmoves
+#
+#     a random number below the number of jumps picks a group, and then
+#     a set bit of that group's mask, by halving the mask six times
+#
+#  Boards of more than 64 squares do not fit a uint64; those, and all
+#  boards without NumPy, are played one game at a time.
+#
+if HAVE_NUMPY:
+    if hasattr(np, 'bitwise_count'):
+        _popcount = np.bitwise_count
+    else:
+        _BYTES = np.array([bin(i).count('1') for i in range(256)], np.uint8)
+        def _popcount(a):
+            return _BYTES[a[..., None].view(np.uint8)].sum(axis=-1, dtype=np.uint8)
+
+    #  Index of the r-th (from 0) set bit of each x
+    def _select(x, r):
+        square = np.zeros(len(x), np.int64)
+        for width in (32, 16, 8, 4, 2, 1):
+            low = x & np.uint64((1 << width) - 1)
+            c = _popcount(low).astype(np.int64)
+            high = r >= c
+            r = np.where(high, r - c, r)
+            x = np.where(high, x >> np.uint64(width), low)
+            square += np.where(high, width, 0)
+        return square
+
+class Playouts:
+    def __init__(self, size=U.SIZE, seed=None):
+        geo = U.geometry(size)
+        self.geo = geo
+        self.rng = random.Random(seed)
+        self.vector = HAVE_NUMPY and geo.squares <= 64
+        if not self.vector: return
+        self.nprng = np.random.default_rng(seed)
+        self.full = np.uint64(geo.full)
+        self.groups = []
+        steps, overs = [], []
+        for step, hops in geo.rays:
+            k = 0
+            for edge, over_shift, land_shift, over in hops:
+                k += 2
+                self.groups.append((np.uint64(edge), over_shift, land_shift,
+                                    k == 2))
+                steps.append(k * step)
+                overs.append(over)
+        self.steps = np.array(steps, np.int64)
+        self.overs = np.array(overs, np.uint64)
+
+    def _align(self, a, shift):
+        if shift > 0:
+            return a >> np.uint64(shift)
+        return (a << np.uint64(-shift)) & self.full
+
+    #  Play 'games' random games from the position (bits, mover).  Returns
+    #  how many of them the mover wins.
+    def run(self, bits, mover, games):
+        if not self.vector:
+            return self._run_positions(bits, mover, games)
+        me = np.full(games, bits[mover], np.uint64)
+        you = np.full(games, bits[U.OTHER[mover]], np.uint64)
+        one = np.uint64(1)
+        moverToMove = True
+        wins = 0
+        while len(me):
+            full = me | you
+            empty = ~full & self.full
+            masks = []
+            for edge, over_shift, land_shift, first in self.groups:
+                if first: alive = me
+                alive = alive & edge & self._align(full, over_shift) & \
+                        self._align(empty, land_shift)
+                masks.append(alive)
+            masks = np.stack(masks, axis=1)
+            counts = _popcount(masks).astype(np.int64)
+            totals = counts.sum(axis=1)
+            over = totals == 0
+            if over.any():
+                # The side to move has no jump and loses
+                if not moverToMove: wins += int(over.sum())
+                going = ~over
+                me, you, masks, counts, totals = (me[going], you[going], masks[going],
+                                                  counts[going], totals[going])
+                if not len(me): break
+            rows = np.arange(len(me))
+            pick = (self.nprng.random(len(me)) * totals).astype(np.int64)
+            ends = counts.cumsum(axis=1)
+            group = (ends > pick[:, None]).argmax(axis=1)
+            pick -= ends[rows, group] - counts[rows, group]
+            frm = _select(masks[rows, group], pick)
+            to = frm + self.steps[group]
+            me ^= (one << frm.astype(np.uint64)) | (one << to.astype(np.uint64))
+            you ^= self.overs[group, frm]
+            me, you = you, me
+            moverToMove = not moverToMove
+        return wins
+
+    def _run_positions(self, bits, mover, games):
+        rng = self.rng
+        geo = self.geo
+        wins = 0
+        for g in range(games):
+            b = dict(bits)
+            who = mover
+            while 1:
+                moves = U.bitmoves(b, who, geo)
+                if not moves: break
+                frm, to, over = rng.choice(moves)
+                b[who] ^= (1 << frm) | (1 << to)
+                who = U.OTHER[who]
+                b[who] ^= over
+            if who != mover: wins += 1
+        return wins
+
+#------------------------------------------------------------------------------
+#  Mobility of many positions
+#
+#  konanebits.bitcount for a stack of positions: the positions' x and o
+#  bitboards are uint64 arrays, and each hop count is computed for both
+#  sides (axis 0) and all four directions (axis 1) of every position
+#  (axis 2) together.  Direction d lines square s + shift up with s by a
+#  right shift when the shift is positive and a left shift when it is
+#  not, so each alignment is both shifts and a select.
+#
+class Mobility:
+    def __init__(self, size=U.SIZE):
+        geo = U.geometry(size)
+        self.geo = geo
+        self.vector = HAVE_NUMPY and geo.squares <= 64
+        if not self.vector: return
+        self.full = np.uint64(geo.full)
+        self.hops = []
+        for k in range(len(geo.rays[0][1])):
+            edge, overShift, landShift = [], [], []
+            for step, hops in geo.rays:
+                e, o, l, over = hops[k]
+                edge.append(e)
+                overShift.append(o)
+                landShift.append(l)
+            self.hops.append((np.array(edge, np.uint64)[:, None],
+                              self._shifts(overShift), self._shifts(landShift)))
+
+    #  (right shift, left shift, use right) columns for a list of shifts
+    def _shifts(self, shifts):
+        right = np.array([max(s, 0) for s in shifts], np.uint64)[:, None]
+        left = np.array([max(-s, 0) for s in shifts], np.uint64)[:, None]
+        return right, left, np.array([s > 0 for s in shifts])[:, None]
+
+    def _align(self, a, shifts):
+        right, left, useRight = shifts
+        return np.where(useRight, a >> right, (a << left) & self.full)
+
+    #  xs and os are lists of bitboards, one pair per position.  Returns
+    #  two lists: the number of jumps x has, and o has, in each.
+    def counts(self, xs, os):
+        if not self.vector:
+            geo = self.geo
+            return ([U.bitcount({'x': x, 'o': o}, 'x', geo) for x, o in zip(xs, os)],
+                    [U.bitcount({'x': x, 'o': o}, 'o', geo) for x, o in zip(xs, os)])
+        sides = np.array([xs, os], np.uint64)
+        full = sides[0] | sides[1]
+        empty = ~full & self.full
+        alive = sides[:, None, :]
+        total = np.zeros(sides.shape, np.int64)
+        for edge, overShifts, landShifts in self.hops:
+            alive = alive & edge & self._align(full, overShifts) & \
+                    self._align(empty, landShifts)
+            total += _popcount(alive).sum(axis=1, dtype=np.int64)
+        return total[0].tolist(), total[1].tolist()
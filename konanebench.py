@@ -0,0 +1,278 @@
+#!/bin/env python3
+#
+# Konane benchmarks.
+#
+# Usage: ./konanebench.py perft DEPTH [--position NAME] [--size N]
+#                               [--engine bits|utils] [--divide]
+#        ./konanebench.py run [--players dts sps ...] [--depth N] [--out FILE]
+#                             [--baseline FILE] [--threshold 0.1]
+#
+#  perft counts the positions exactly DEPTH plies from a position (the
+#  standard start on a --size board, or one from the corpus) and, with
+#  --divide, the count below each first move.  The counts are exact, so
+#  two engines or two versions of one engine must agree on them.
+#
+#  run times the move generation routines (genmoves, make_succ, moveable
+#  and the bitboard equivalents) and each player module's search over the
+#  position corpus in konanebench_positions.txt, grouped by game phase:
+#  nodes per second, and the time to finish the search.  Players with
+#  iterative deepening (a 'deepen' method) search to --depth; others run
+#  their own fixed-depth move().  Nodes are counted as calls of the
+#  player's search function (negamax, or minimax in older players).
+#
+#  Results go to a JSON file.  Given --baseline, each metric is compared
+#  with the stored one and the exit status is 1 if any is worse by more
+#  than --threshold (a fraction).
+#
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os.path
+import platform
+import sys
+import time
+import konaneutils as U
+import konanebits as B
+import konaneevents as EV
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'konanebench_positions.txt')
+
+#------------------------------------------------------------------------------
+#  Position corpus
+#
+#  Returns a list of (name, phase, mover, board).
+#
+def load_corpus(path=CORPUS):
+    positions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            name, phase, mover, rows = line.split()
+            board = [list(row.replace('.', ' ')) for row in rows.split('/')]
+            positions.append((name, phase, mover, board))
+    return positions
+
+def find_position(name, size=B.SIZE):
+    if name == 'start':
+        return ('start', 'opening', 'x', U.populate_board(size))
+    for p in load_corpus():
+        if p[0] == name:
+            return p
+    print("No position named", name)
+    sys.exit(1)
+
+#------------------------------------------------------------------------------
+#  perft
+#
+def perft_utils(b, mover, depth):
+    if depth <= 0: return 1
+    other = B.OTHER[mover]
+    return sum(perft_utils(n.b, other, depth - 1) for n in U.genmoves(b, mover))
+
+#  The last ply is counted, not made
+#
+def perft_bits(pos, mover, depth):
+    if depth <= 0: return 1
+    if depth == 1: return pos.count(mover)
+    other = B.OTHER[mover]
+    total = 0
+    for m in pos.moves(mover):
+        pos.make(mover, m)
+        total += perft_bits(pos, other, depth - 1)
+        pos.unmake(mover, m)
+    return total
+
+#  Returns [(move, count), ...] for the moves of the first ply
+#
+def divide(b, mover, depth, engine):
+    other = B.OTHER[mover]
+    counts = []
+    if engine == 'utils':
+        for n in U.genmoves(b, mover):
+            counts.append((n.move, perft_utils(n.b, other, depth - 1)))
+    else:
+        pos = B.Position(b)
+        for m in pos.moves(mover):
+            pos.make(mover, m)
+            counts.append((pos.move_tuple(m), perft_bits(pos, other, depth - 1)))
+            pos.unmake(mover, m)
+    return sorted(counts)
+
+def move_name(move):
+    from_row, from_col, to_row, to_col = move
+    return '%d%s-%d%s' % (from_row, U.COLUMNS[from_col], to_row, U.COLUMNS[to_col])
+
+def perft_command(args):
+    name, phase, mover, b = find_position(args.position, args.size)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(b, mover, args.depth, args.engine)
+        for move, count in counts:
+            print(move_name(move) + ':', count)
+        total = sum(count for move, count in counts)
+    elif args.engine == 'utils':
+        total = perft_utils(b, mover, args.depth)
+    else:
+        total = perft_bits(B.Position(b), mover, args.depth)
+    elapsed = time.perf_counter() - start
+    print("perft(%d) %s: %d  (%.3fs, %s engine)" % (args.depth, name, total,
+                                                     elapsed, args.engine))
+
+#------------------------------------------------------------------------------
+#  Timing
+#
+
+#  Calls fn() over and over for at least 'seconds'; returns calls/second.
+#  Each call of fn may do many operations; 'ops' says how many.
+#
+def rate(fn, seconds, ops=1):
+    calls = 0
+    start = time.perf_counter()
+    while 1:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds: break
+    return calls * ops / elapsed
+
+def micro_benchmarks(positions, seconds):
+    boards = [(b, mover) for name, phase, mover, b in positions]
+    bits = [(B.to_bits(b), mover) for b, mover in boards]
+
+    # Every (from, to) pair make_succ would be asked about by genmoves
+    candidates = []
+    for b, mover in boards:
+        for from_row, from_col in U.places[mover]:
+            if U.moveable(from_row, from_col, b):
+                for to_row, to_col in U.dests_from(from_row, from_col):
+                    candidates.append((b, mover, from_row, from_col, to_row, to_col))
+    squares = [(r, c, b) for b, mover in boards for r, c in U.places[mover]]
+
+    metrics = {}
+    metrics['micro.genmoves.calls_per_sec'] = rate(
+        lambda: [U.genmoves(b, m) for b, m in boards], seconds, len(boards))
+    metrics['micro.make_succ.calls_per_sec'] = rate(
+        lambda: [U.make_succ(*c) for c in candidates], seconds, len(candidates))
+    metrics['micro.moveable.calls_per_sec'] = rate(
+        lambda: [U.moveable(*s) for s in squares], seconds, len(squares))
+    metrics['micro.count_moves.calls_per_sec'] = rate(
+        lambda: [U.count_moves(b, m) for b, m in boards], seconds, len(boards))
+    metrics['micro.bitmoves.calls_per_sec'] = rate(
+        lambda: [B.bitmoves(x, m) for x, m in bits], seconds, len(bits))
+    metrics['micro.bitcount.calls_per_sec'] = rate(
+        lambda: [B.bitcount(x, m) for x, m in bits], seconds, len(bits))
+    return metrics
+
+#  Search one position; returns (nodes, seconds).  A player that can
+#  use an opening book or endgame table is made without them, so that
+#  every position is searched.
+#
+def time_search(module, b, mover, depth):
+    params = inspect.signature(module.Konane).parameters
+    kwargs = {name: None for name in ('book', 'egtb') if name in params}
+    K = module.Konane([row[:] for row in b], mover, **kwargs)
+    if hasattr(K, 'deepen'):
+        K.time_limit = 1e9
+        K.max_depth = depth
+    nodes = [0]
+    name = 'negamax' if hasattr(K, 'negamax') else 'minimax'
+    search = getattr(K, name)
+    def counting(*args):
+        nodes[0] += 1
+        return search(*args)
+    setattr(K, name, counting)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        K.move()
+    return nodes[0], time.perf_counter() - start
+
+def search_benchmarks(positions, players, depth):
+    EV.headless()
+    metrics = {}
+    for player in players:
+        module = __import__(player)
+        phases = {}
+        for name, phase, mover, b in positions:
+            nodes, seconds = time_search(module, b, mover, depth)
+            total = phases.setdefault(phase, [0, 0.0])
+            total[0] += nodes
+            total[1] += seconds
+        for phase, (nodes, seconds) in phases.items():
+            metrics['%s.%s.nps' % (player, phase)] = nodes / seconds
+            metrics['%s.%s.seconds' % (player, phase)] = seconds
+    return metrics
+
+#------------------------------------------------------------------------------
+#  Baseline comparison
+#
+#  Rates (names ending in _per_sec or nps) should not drop; times
+#  (ending in seconds) should not grow.
+#
+def compare(metrics, baseline, threshold):
+    regressions = []
+    for name in sorted(metrics):
+        if name not in baseline: continue
+        new, old = metrics[name], baseline[name]
+        if name.endswith('seconds'):
+            change = old / new - 1 if new else 0.0
+        else:
+            change = new / old - 1 if old else 0.0
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print("%-40s %14.6g %14.6g %+7.1f%%%s" % (name, old, new, 100 * change, flag))
+    return regressions
+
+def run_command(args):
+    positions = load_corpus()
+    metrics = micro_benchmarks(positions, args.seconds)
+    metrics.update(search_benchmarks(positions, args.players, args.depth))
+    for name in sorted(metrics):
+        print("%-40s %14.6g" % (name, metrics[name]))
+
+    results = {'python': platform.python_version(), 'depth': args.depth,
+               'players': args.players, 'metrics': metrics}
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['metrics']
+        print()
+        print("%-40s %14s %14s %8s" % ('metric', 'baseline', 'now', 'change'))
+        if compare(metrics, baseline, args.threshold):
+            sys.exit(1)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Konane benchmarks.")
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('perft', help="count leaf positions at a fixed depth")
+    p.add_argument('depth', type=int)
+    p.add_argument('--position', default='start', help="'start' or a corpus position name")
+    p.add_argument('--size', type=int, default=8, help="board size for the start position")
+    p.add_argument('--engine', choices=('bits', 'utils'), default='bits')
+    p.add_argument('--divide', action='store_true', help="show the count under each first move")
+    p.set_defaults(func=perft_command)
+
+    p = sub.add_parser('run', help="speed of move generation and search over the corpus")
+    p.add_argument('--players', nargs='+', default=['dts', 'sps', 'player1'])
+    p.add_argument('--depth', type=int, default=5, help="search depth for iterative-deepening players")
+    p.add_argument('--seconds', type=float, default=0.5, help="time per move generation benchmark")
+    p.add_argument('--out', default='bench.json')
+    p.add_argument('--baseline', help="earlier results file to compare against")
+    p.add_argument('--threshold', type=float, default=0.10)
+    p.set_defaults(func=run_command)
+
+    args = ap.parse_args(argv)
+    if args.command == 'perft' and args.depth < (1 if args.divide else 0):
+        ap.error("perft needs a depth of at least %d" % (1 if args.divide else 0))
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
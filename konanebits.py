@@ -0,0 +1,705 @@
+# Bitboard Konane Engine
+#
+#-------------------------------------------------------------------------
+# The same game as konaneutils, stored differently.  Each side is one
+# integer with bit (row*size + col) set when that side has a piece on
+# (row, col): 64 bits on the standard 8x8 board, 256 on 16x16.  Jump
+# geometry is precomputed once per board size, direction and hop count,
+# so move generation works on all of a player's pieces at once with a
+# few shifts and ANDs instead of indexing square by square, however big
+# the board.
+#
+# genmoves and gameDone keep the konaneutils contract (list-of-lists
+# board in, Node objects / True-or-None out), so a player module can
+# switch engines with
+#
+#     import konanebits as U
+#
+#------------------------------------------------------------------------------
+#
+# Functions on bitboards ({'x': bits, 'o': bits}):
+#
+# bitmoves: from the bitboards and a mover, list of (frm, to, over)
+#           jumps, where frm/to are square numbers and over is the
+#           mask of captured pieces
+#
+# has_move: True if the mover has at least one jump
+#
+# bitcount: number of jumps for the mover, without listing them
+#
+# movable: mask of the mover's pieces that have at least one jump
+#
+# geometry: the jump tables and Zobrist keys for one board size, built
+#           on first use
+#
+# canonical_key: the key shared by a position and its seven reflections
+#           and rotations (with colours swapped where needed), and the
+#           transform to it; transform_move / transform_bits map moves
+#           and positions through a transform
+#
+# Conversion and compatibility:
+#
+# to_bits / to_board: list-of-lists board <-> bitboards
+#
+# move_tuple: (frm, to, over) jump -> (from_row, from_col, to_row, to_col)
+#
+# Position: a mutable bitboard position for search, with make/unmake
+#           and an incrementally updated Zobrist hash
+#
+# genmoves / gameDone / count_moves: drop-in replacements for the
+#           konaneutils versions; successor boards and the starting
+#           board (populate_board) come from konaneutils itself
+#
+# selftest: differential test against konaneutils, and of the dts search
+#           against the exact endgame solver (python konanebits.py)
+#
+#------------------------------------------------------------------------------
+#
+import random
+import konaneutils
+
+SIZE = 8
+
+#------------------------------------------------------------------------------
+#  Precomputed jump tables
+#
+#  Boards can be any even size from 4x4 up; everything that depends on
+#  the size lives in a Geometry, built once per size by geometry(size)
+#  and shared by every board of that size.  Squares are numbered
+#  row*size + col, so a board is a (size*size)-bit integer per side.
+#
+#  A jump of k hops in direction (dr, dc) from square s jumps over the
+#  squares s + (2i-1)*step and lands on s + 2i*step for i = 1..k.
+#
+#  rays is one entry per direction:
+#     (step, hops)
+#  and hops is one entry per hop count k:
+#     (edge, over_shift, land_shift, over)
+#   edge       mask of starting squares for which the k-hop jump stays
+#              on the board
+#   over_shift, land_shift
+#              how far the board has to be shifted to line the k-th
+#              jumped / landing square up with the starting square
+#   over[s]    mask of all squares captured by the k-hop jump from s
+#
+#  jumps[(frm, to)] is the (frm, to, over) move for every jump geometry
+#  on the board, for rebuilding moves that were stored as just two
+#  squares.
+#
+#  zobrist[p][s] is a random 64-bit key for player p on square s, and a
+#  position's hash is the XOR of the keys of all its pieces.  sideKey is
+#  mixed in when 'o' is to move.  zover[p][over] is the XOR of p's keys
+#  for every capture mask in rays, so a jump updates the hash with three
+#  XORs.  The generator is seeded so keys are the same in every process.
+#
+class Geometry:
+    def __init__(self, size):
+        if size < 4 or size % 2:
+            raise ValueError("board size must be even and at least 4, not %r" % size)
+        self.size = size
+        self.squares = size * size
+        self.full = (1 << self.squares) - 1
+        self.rays = self._build_rays()
+        self.jumps = self._build_jumps()
+        self.zobrist, self.zover, self.sideKey = self._build_zobrist()
+
+    def _build_rays(self):
+        size = self.size
+        rays = []
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            step = dr * size + dc
+            hops = []
+            for k in range(1, size // 2):
+                edge = 0
+                over = [0] * self.squares
+                for r in range(size):
+                    for c in range(size):
+                        if not (0 <= r + 2*k*dr < size and 0 <= c + 2*k*dc < size):
+                            continue
+                        s = r * size + c
+                        edge |= 1 << s
+                        for i in range(1, k + 1):
+                            over[s] |= 1 << (s + (2*i - 1) * step)
+                hops.append((edge, (2*k - 1) * step, 2*k * step, over))
+            rays.append((step, hops))
+        return rays
+
+    def _build_jumps(self):
+        jumps = {}
+        for step, hops in self.rays:
+            k = 0
+            for edge, over_shift, land_shift, over in hops:
+                k += 2
+                for s in range(self.squares):
+                    if edge >> s & 1:
+                        jumps[(s, s + k*step)] = (s, s + k*step, over[s])
+        return jumps
+
+    def _build_zobrist(self):
+        rng = random.Random(0x4b6f6e616e65)
+        zobrist = {}
+        zover = {}
+        for p in ('x', 'o'):
+            zobrist[p] = [rng.getrandbits(64) for s in range(self.squares)]
+            zover[p] = {}
+            for step, hops in self.rays:
+                for edge, over_shift, land_shift, over in hops:
+                    for mask in over:
+                        h = 0
+                        m = mask
+                        while m:
+                            low = m & -m
+                            h ^= zobrist[p][low.bit_length() - 1]
+                            m ^= low
+                        zover[p][mask] = h
+        return zobrist, zover, rng.getrandbits(64)
+
+_GEOMETRIES = {}
+
+def geometry(size):
+    g = _GEOMETRIES.get(size)
+    if g is None:
+        g = _GEOMETRIES[size] = Geometry(size)
+    return g
+
+#  The standard 8x8 board's tables, under the names the 8x8-only code
+#  (the endgame database, the opening book) uses
+G8 = geometry(SIZE)
+SQUARES = G8.squares
+FULL = G8.full
+RAYS = G8.rays
+JUMPS = G8.jumps
+ZOBRIST, ZOVER, SIDE_KEY = G8.zobrist, G8.zover, G8.sideKey
+
+def zobrist_hash(bits, geo=G8):
+    h = 0
+    for p in ('x', 'o'):
+        zobrist = geo.zobrist[p]
+        m = bits[p]
+        while m:
+            low = m & -m
+            h ^= zobrist[low.bit_length() - 1]
+            m ^= low
+    return h
+
+#  Line the square s+shift up with square s.
+#
+def _align(bits, shift, full):
+    if shift > 0:
+        return bits >> shift
+    return (bits << -shift) & full
+
+#------------------------------------------------------------------------------
+#  All jumps for mover, as (frm, to, over) tuples.  geo is the board's
+#  Geometry; like the other bitboard functions this defaults to 8x8.
+#
+#  'alive' holds the starting squares whose jump is still legal after
+#  k hops; each extra hop can only remove squares from it.
+#
+def bitmoves(bits, mover, geo=G8):
+    full = geo.full
+    occ = bits['x'] | bits['o']
+    empty = ~occ & full
+    moves = []
+    for step, hops in geo.rays:
+        alive = bits[mover]
+        k = 0
+        for edge, over_shift, land_shift, over in hops:
+            k += 2
+            alive &= edge & _align(occ, over_shift, full) & _align(empty, land_shift, full)
+            if not alive: break
+            m = alive
+            while m:
+                low = m & -m
+                frm = low.bit_length() - 1
+                moves.append((frm, frm + k*step, over[frm]))
+                m ^= low
+    return moves
+
+#  True if mover has any jump.  Every multi-hop jump starts with a legal
+#  single hop, so only the first hop of each direction has to be tried.
+#
+def has_move(bits, mover, geo=G8):
+    full = geo.full
+    occ = bits['x'] | bits['o']
+    empty = ~occ & full
+    mine = bits[mover]
+    for step, hops in geo.rays:
+        edge, over_shift, land_shift, over = hops[0]
+        if mine & edge & _align(occ, over_shift, full) & _align(empty, land_shift, full):
+            return True
+    return False
+
+#  Number of jumps for mover.  Each set bit of 'alive' is one jump, so
+#  this is bitmoves with the loop over pieces replaced by a popcount.
+#
+#  A jump changes mobility only along its own row and the columns it
+#  crosses (or column and rows), but on bitboards a whole-board count is
+#  a dozen word operations, so it is recounted rather than patched.
+#
+def bitcount(bits, mover, geo=G8):
+    full = geo.full
+    occ = bits['x'] | bits['o']
+    empty = ~occ & full
+    count = 0
+    for step, hops in geo.rays:
+        alive = bits[mover]
+        for edge, over_shift, land_shift, over in hops:
+            alive &= edge & _align(occ, over_shift, full) & _align(empty, land_shift, full)
+            if not alive: break
+            count += alive.bit_count()
+    return count
+
+def movable(bits, mover, geo=G8):
+    full = geo.full
+    occ = bits['x'] | bits['o']
+    empty = ~occ & full
+    mine = bits[mover]
+    pieces = 0
+    for step, hops in geo.rays:
+        edge, over_shift, land_shift, over = hops[0]
+        pieces |= mine & edge & _align(occ, over_shift, full) & _align(empty, land_shift, full)
+    return pieces
+
+#------------------------------------------------------------------------------
+#  Symmetry
+#
+#  The board has the eight symmetries of a square.  Transform t (0..7)
+#  transposes the board if t & 4, then reverses the rows if t & 1 and
+#  the columns if t & 2; t = 0 is the identity.  On an even-sized board
+#  reversing the rows or the columns moves every piece onto a square of
+#  the other colour, so those transforms also swap x and o, and with
+#  them the side to move.  The image of a position has the same value
+#  for the side to move, and its moves are the position's moves sent
+#  square by square.
+#
+#  A position's canonical key is the smallest Zobrist key among its
+#  eight images, and its canonical transform is the t that gives it.  A
+#  table keyed on canonical keys holds one entry for all the variants
+#  of a position; a move stored with an entry is a move of the
+#  canonical image, and transform_move(move, inverse[t]) turns it back
+#  into a move of the position probed.
+#
+#  Symmetry(geo) holds, for one board size:
+#     squares[t][s]   the square transform t sends square s to
+#     swap[t]         True if t swaps the colours
+#     inverse[t]      the transform that undoes t
+#     keys[t][p][i]   for each byte value v of byte i of p's bitboard,
+#                     the XOR of the keys of those pieces in t's image,
+#                     so an image's key is a few lookups per byte
+#                     instead of one per piece
+#     side[t][mover]  the side-to-move key of the image
+#
+#  symmetry(geo) builds it on first use; most programs never need it.
+#
+class Symmetry:
+    def __init__(self, geo):
+        size = geo.size
+        last = size - 1
+        self.squares = []
+        self.swap = []
+        for t in range(8):
+            image = []
+            for s in range(geo.squares):
+                r, c = divmod(s, size)
+                if t & 4: r, c = c, r
+                if t & 1: r = last - r
+                if t & 2: c = last - c
+                image.append(r * size + c)
+            self.squares.append(image)
+            self.swap.append(bool(t & 1) != bool(t & 2))
+        self.inverse = [u for t in range(8) for u in range(8)
+                        if all(self.squares[u][s2] == s for s, s2 in
+                               enumerate(self.squares[t]))]
+        self.bytes = (geo.squares + 7) // 8
+        self.keys = []
+        self.side = []
+        for t in range(8):
+            image = self.squares[t]
+            keys = {}
+            for p in ('x', 'o'):
+                zobrist = geo.zobrist[OTHER[p] if self.swap[t] else p]
+                keys[p] = []
+                for i in range(self.bytes):
+                    table = [0] * 256
+                    for v in range(1, 256):
+                        low = v & -v
+                        s = 8*i + low.bit_length() - 1
+                        table[v] = table[v ^ low]
+                        if s < geo.squares: table[v] ^= zobrist[image[s]]
+                    keys[p].append(table)
+            self.keys.append(keys)
+            self.side.append({m: geo.sideKey if (OTHER[m] if self.swap[t] else m) == 'o'
+                              else 0 for m in ('x', 'o')})
+
+_SYMMETRIES = {}
+
+def symmetry(geo=G8):
+    sym = _SYMMETRIES.get(geo.size)
+    if sym is None:
+        sym = _SYMMETRIES[geo.size] = Symmetry(geo)
+    return sym
+
+#  The keys of the eight images of the position, with 'mover' to move;
+#  t = 0 gives Position.key(mover)
+#
+def symmetric_keys(bits, mover, geo=G8):
+    sym = symmetry(geo)
+    xBytes = [(i, v) for i, v in enumerate(bits['x'].to_bytes(sym.bytes, 'little')) if v]
+    oBytes = [(i, v) for i, v in enumerate(bits['o'].to_bytes(sym.bytes, 'little')) if v]
+    keys = []
+    for t in range(8):
+        xKeys, oKeys = sym.keys[t]['x'], sym.keys[t]['o']
+        h = sym.side[t][mover]
+        for i, v in xBytes: h ^= xKeys[i][v]
+        for i, v in oBytes: h ^= oKeys[i][v]
+        keys.append(h)
+    return keys
+
+#  (canonical key, canonical transform)
+#
+def canonical_key(bits, mover, geo=G8):
+    keys = symmetric_keys(bits, mover, geo)
+    key = min(keys)
+    return key, keys.index(key)
+
+#  The image of a (frm, to, over) move under transform t
+#
+def transform_move(move, t, geo=G8):
+    image = symmetry(geo).squares[t]
+    return geo.jumps[(image[move[0]], image[move[1]])]
+
+#  The image of a position under transform t: (bits, mover)
+#
+def transform_bits(bits, mover, t, geo=G8):
+    sym = symmetry(geo)
+    image = sym.squares[t]
+    out = {}
+    for p in ('x', 'o'):
+        m = bits[p]
+        mapped = 0
+        while m:
+            low = m & -m
+            mapped |= 1 << image[low.bit_length() - 1]
+            m ^= low
+        out[OTHER[p] if sym.swap[t] else p] = mapped
+    return out, OTHER[mover] if sym.swap[t] else mover
+
+#------------------------------------------------------------------------------
+#  Conversion between the list-of-lists board and bitboards
+#
+_XBITS = str.maketrans('xo ', '100')
+_OBITS = str.maketrans('xo ', '010')
+
+def to_bits(b):
+    # Square 0 is the lowest bit, so read the flattened board backwards
+    s = ''.join([''.join(row) for row in b])[::-1]
+    return {'x': int(s.translate(_XBITS), 2), 'o': int(s.translate(_OBITS), 2)}
+
+def to_board(bits, size=SIZE):
+    b = [[' '] * size for i in range(size)]
+    for p in ('x', 'o'):
+        m = bits[p]
+        while m:
+            low = m & -m
+            s = low.bit_length() - 1
+            b[s // size][s % size] = p
+            m ^= low
+    return b
+
+def move_tuple(move, size=SIZE):
+    frm, to, over = move
+    return (frm // size, frm % size, to // size, to % size)
+
+#------------------------------------------------------------------------------
+#  Position object for search.
+#
+#  Moves are made and taken back in place, so searching a tree allocates
+#  no boards at all.  A move already carries everything needed to undo
+#  it (the from/to squares and the mask of captured pieces), and since
+#  XOR is its own inverse, unmake is the same operation as make.
+#
+#  hash follows the pieces on the board; key(mover) adds the side to
+#  move, and is what transposition tables should be indexed with.
+#  geo is the Geometry for the board's size.
+#
+OTHER = {'x': 'o', 'o': 'x'}
+
+class Position:
+    def __init__(self, b):
+        self.geo = geometry(len(b))
+        self.bits = to_bits(b)
+        self.hash = zobrist_hash(self.bits, self.geo)
+
+    def key(self, mover):
+        if mover == 'o':
+            return self.hash ^ self.geo.sideKey
+        return self.hash
+
+    #  (canonical key, canonical transform); see Symmetry
+    def canonical_key(self, mover):
+        return canonical_key(self.bits, mover, self.geo)
+
+    def moves(self, mover):
+        return bitmoves(self.bits, mover, self.geo)
+
+    def has_move(self, mover):
+        return has_move(self.bits, mover, self.geo)
+
+    def count(self, mover):
+        return bitcount(self.bits, mover, self.geo)
+
+    def pieces(self):
+        return (self.bits['x'] | self.bits['o']).bit_count()
+
+    def make(self, mover, move):
+        frm, to, over = move
+        other = OTHER[mover]
+        bits = self.bits
+        bits[mover] ^= (1 << frm) | (1 << to)
+        bits[other] ^= over
+        z = self.geo.zobrist[mover]
+        self.hash ^= z[frm] ^ z[to] ^ self.geo.zover[other][over]
+
+    def unmake(self, mover, move):
+        frm, to, over = move
+        other = OTHER[mover]
+        bits = self.bits
+        bits[mover] ^= (1 << frm) | (1 << to)
+        bits[other] ^= over
+        z = self.geo.zobrist[mover]
+        self.hash ^= z[frm] ^ z[to] ^ self.geo.zover[other][over]
+
+    def board(self):
+        return to_board(self.bits, self.geo.size)
+
+    def move_tuple(self, move):
+        return move_tuple(move, self.geo.size)
+
+#------------------------------------------------------------------------------
+#  konaneutils-compatible interface
+#
+def gameDone(b, mover):
+    if has_move(to_bits(b), mover, geometry(len(b))):
+        return None
+    return True
+
+def count_moves(b, mover):
+    return bitcount(to_bits(b), mover, geometry(len(b)))
+
+def genmoves(b, mover):
+    size = len(b)
+    return [konaneutils.make_jump(b, mover, move_tuple(move, size))
+            for move in bitmoves(to_bits(b), mover, geometry(size))]
+
+# The starting board is the same in both engines
+populate_board = konaneutils.populate_board
+
+#------------------------------------------------------------------------------
+#  Differential test against the list-of-lists engine.
+#
+#  Plays random games from the standard opening, and also checks random
+#  scattered boards that are not reachable in play, comparing the move
+#  lists, successor boards and gameDone answers of both engines, and
+#  checking that Position.make/unmake agree with them and keep the
+#  incremental hash right, and that the move counters and movable-piece
+#  masks match the move lists.  konaneutils' flat-board routines, which
+#  sps and player1 search with, must give the moves of jumps in the
+#  same order, the same successors, counts and gameDone answers.  On
+#  the scattered boards it also checks each symmetry: the image's key
+#  is the one symmetric_keys predicts, its moves are the images of the
+#  moves, and all eight images share one canonical key.  Each board
+#  size in 'sizes' gets its own round of games and boards, and
+#  konanebatch.Mobility must count the jumps on that round's scattered
+#  boards as bitcount does.  On 'solved' sparse 8x8 boards small enough
+#  for konaneegtb.solve, dts's verdict at the root must be the solver's.
+#  Last, dts must score the root moves of 'batched' boards the same with
+#  and without batch_leaves, and konanebatch.Playouts must win as often
+#  as random games played one at a time.
+#
+def _same(b, mover):
+    want = sorted((n.move, n.b) for n in konaneutils.genmoves(b, mover))
+    got = sorted((n.move, n.b) for n in genmoves(b, mover))
+    if want != got:
+        return False
+
+    # make/unmake must produce the same boards and restore the position
+    pos = Position(b)
+    before = dict(pos.bits)
+    made = []
+    for move in pos.moves(mover):
+        pos.make(mover, move)
+        made.append((pos.move_tuple(move), pos.board()))
+        if pos.hash != zobrist_hash(pos.bits, pos.geo):
+            return False
+        pos.unmake(mover, move)
+        if pos.bits != before:
+            return False
+    if sorted(made) != want:
+        return False
+    if not (len(want) == konaneutils.count_moves(b, mover) ==
+            count_moves(b, mover) == pos.count(mover)):
+        return False
+    if movable(pos.bits, mover, pos.geo) != sum(1 << (m[0] * len(b) + m[1]) for m in
+                                                set(n[0][:2] for n in want)):
+        return False
+    if not _same_flat(b, mover, want):
+        return False
+    return bool(konaneutils.gameDone(b, mover)) == bool(gameDone(b, mover))
+
+def _same_flat(b, mover, want):
+    U = konaneutils
+    size = len(b)
+    fb = U.flatten(b)
+    if U.unflatten(fb) != b:
+        return False
+    packed = list(U.flat_jumps(fb, mover))
+    moves = [U.unpack_move(m, size) for m in packed]
+    if moves != list(U.jumps(b, mover)):
+        return False
+    if [U.pack_move(m, size) for m in moves] != packed or \
+       list(U.move_array(fb, mover)) != packed:
+        return False
+    made = sorted((move, U.unflatten(U.flat_make(fb, mover, m)))
+                  for move, m in zip(moves, packed))
+    if made != want:
+        return False
+    return U.flat_count(fb, mover) == len(want) and \
+           bool(U.flat_done(fb, mover)) == bool(U.gameDone(b, mover))
+
+def _symmetric(b, mover):
+    pos = Position(b)
+    geo = pos.geo
+    keys = symmetric_keys(pos.bits, mover, geo)
+    canonical = pos.canonical_key(mover)[0]
+    moves = pos.moves(mover)
+    for t in range(8):
+        bits, image_mover = transform_bits(pos.bits, mover, t, geo)
+        image = Position(to_board(bits, geo.size))
+        if image.key(image_mover) != keys[t]:
+            return False
+        if image.canonical_key(image_mover)[0] != canonical:
+            return False
+        mapped = [transform_move(m, t, geo) for m in moves]
+        if sorted(mapped) != sorted(image.moves(image_mover)):
+            return False
+        back = symmetry(geo).inverse[t]
+        if [transform_move(m, back, geo) for m in mapped] != moves:
+            return False
+    return True
+
+#  dts searched to the end (deepen with ponder=True has no time limit and
+#  prints nothing) must call the position won exactly when solve does.
+#  Both import this module, so they are imported here.
+def _solved_agrees(b, mover):
+    import dts
+    import konaneegtb
+    try:
+        win, distance = konaneegtb.solve(Position(b), mover, {}, [20000])
+    except konaneegtb.TreeTooBig:
+        return None
+    player = dts.Konane(b, mover, egtb=None, book=None)
+    pos = Position(b)
+    score = player.deepen(pos, pos.moves(mover), ponder=True)[0][0]
+    return abs(score) >= dts.WIN and (score > 0) == win
+
+#  konanebatch's NumPy routines against the konanebits code they stand
+#  in for.  Without NumPy they are that code, and agree trivially.
+def _batched_counts(boards, size):
+    import konanebatch
+    geo = geometry(size)
+    bits = [to_bits(b) for b in boards]
+    xs, os = konanebatch.Mobility(size).counts([p['x'] for p in bits],
+                                               [p['o'] for p in bits])
+    return xs == [bitcount(p, 'x', geo) for p in bits] and \
+           os == [bitcount(p, 'o', geo) for p in bits]
+
+#  Random games are random, so the two win rates need only be within five
+#  standard errors of each other.
+def _batched_playouts(b, mover, games, seed):
+    import konanebatch
+    engine = konanebatch.Playouts(len(b), seed)
+    bits = to_bits(b)
+    batched = engine.run(bits, mover, games) / games
+    single = engine._run_positions(bits, mover, games) / games
+    p = (batched + single) / 2
+    return abs(batched - single) <= 5 * (2 * p * (1 - p) / games) ** 0.5
+
+#  frontier scores the children of a node above the leaves as negamax
+#  would, so the root scores must be the same.  The node counts are
+#  not: negamax searches a leaf again when its null-window score falls
+#  inside the window, and frontier scores each leaf once.
+def _batch_leaves_agree(b, mover, depth):
+    import dts
+    pos = Position(b)
+    scored = []
+    for batch in (False, True):
+        player = dts.Konane(b, mover, egtb=None, book=None, batch_leaves=batch)
+        player.max_depth = depth
+        scored.append(player.deepen(pos, pos.moves(mover), ponder=True))
+    return scored[0] == scored[1]
+
+def selftest(games=200, boards=2000, seed=1, sizes=(8, 4, 6, 10, 16), solved=200,
+             batched=100):
+    rng = random.Random(seed)
+    positions = 0
+    for size in sizes:
+        # Fewer of the other sizes; 8x8 is the one that gets played
+        scale = 1 if size == SIZE else 8
+        for g in range(games // scale):
+            b = populate_board(size)
+            mover, other = 'x', 'o'
+            while 1:
+                positions += 1
+                if not _same(b, mover):
+                    raise AssertionError("engines disagree in %dx%d game %d" % (size, size, g))
+                succ = konaneutils.genmoves(b, mover)
+                if not succ: break
+                b = rng.choice(succ).b
+                mover, other = other, mover
+        scattered = []
+        for g in range(boards // scale):
+            keep = rng.random()
+            b = [[(('x', 'o')[(i + j) % 2] if rng.random() < keep else ' ')
+                  for j in range(size)] for i in range(size)]
+            scattered.append(b)
+            for mover in ('x', 'o'):
+                positions += 1
+                if not _same(b, mover):
+                    raise AssertionError("engines disagree on board %r" % b)
+                if not _symmetric(b, mover):
+                    raise AssertionError("symmetries disagree on board %r" % b)
+        if not _batched_counts(scattered, size):
+            raise AssertionError("Mobility.counts disagrees with bitcount on %dx%d" %
+                                 (size, size))
+    print("konanebits agrees with konaneutils on", positions, "positions")
+    checked = 0
+    while checked < solved:
+        keep = rng.uniform(0.1, 0.35)
+        b = [[(('x', 'o')[(i + j) % 2] if rng.random() < keep else ' ')
+              for j in range(SIZE)] for i in range(SIZE)]
+        mover = rng.choice(('x', 'o'))
+        if not Position(b).has_move(mover): continue
+        agrees = _solved_agrees(b, mover)
+        if agrees is None: continue
+        if not agrees:
+            raise AssertionError("dts and the solver disagree for %s on board %r" % (mover, b))
+        checked += 1
+    print("dts agrees with the endgame solver on", checked, "positions")
+    checked = 0
+    for g in range(batched):
+        keep = rng.uniform(0.3, 1.0)
+        b = [[(('x', 'o')[(i + j) % 2] if rng.random() < keep else ' ')
+              for j in range(SIZE)] for i in range(SIZE)]
+        mover = rng.choice(('x', 'o'))
+        if not Position(b).has_move(mover): continue
+        if not _batch_leaves_agree(b, mover, rng.randint(1, 3)):
+            raise AssertionError("batch_leaves changes dts's scores for %s on board %r" %
+                                 (mover, b))
+        if g % 20 == 0 and not _batched_playouts(b, mover, 1000, g):
+            raise AssertionError("batched playouts disagree for %s on board %r" % (mover, b))
+        checked += 1
+    print("batched search and playouts agree on", checked, "positions")
+
+if __name__ == '__main__':
+    selftest()
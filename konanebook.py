@@ -0,0 +1,193 @@
+#!/bin/env python3
+#
+# Konane opening book.
+#
+# Usage: ./konanebook.py build [--plies N] [--time SECONDS] [--workers N] [--out FILE]
+#        ./konanebook.py info [FILE]
+#
+#  Every game starts from the same position, so the first few moves can
+#  be searched once, offline, as deeply as we like.  'build' walks the
+#  opening tree from the standard start to --plies plies, merging
+#  positions reached by different move orders and positions that are
+#  reflections or rotations of each other, searches each one with
+#  the dts player for --time seconds in a process pool, and writes the
+#  best move and score for every position to a book file.
+#
+#  Finished searches are appended to FILE.progress as they come in, so an
+#  interrupted build picks up where it stopped when run again.
+#
+#  File layout (little-endian):
+#     header     magic, entry count
+#     keys       count * 8 bytes, Position.canonical_key(mover), sorted
+#     entries    count * 8 bytes: from square, to square, depth, unused,
+#                score (signed 32 bits)
+#
+#  A stored move is a move of the position's canonical image (see
+#  konanebits.Symmetry); probing maps it back to the position asked
+#  about.  Books from before symmetry (magic KONBOOK1) are keyed by
+#  Position.key(mover) and are still read that way.  OpeningBook maps the
+#  file and finds a key by binary search, in a few microseconds.
+#
+import argparse
+import bisect
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import konanebits as U
+import konaneevents as EV
+
+MAGIC = b'KONBOOK2'
+PLAIN_MAGIC = b'KONBOOK1'     # older books, keyed by Position.key(mover)
+HEADER = struct.Struct('<8sQ')
+ENTRY = struct.Struct('<BBBxi')
+
+#------------------------------------------------------------------------------
+#  Building
+#
+
+#  All positions up to 'plies' plies from the start, with transpositions
+#  and symmetric positions merged.  Returns {canonical key: (bits,
+#  mover)}, with the first variant of each position found.  Positions
+#  where the mover has no move are left out; there is nothing to look up
+#  for them.
+#
+def opening_tree(plies):
+    start = U.Position(U.populate_board())
+    level = {start.canonical_key('x')[0]: (dict(start.bits), 'x')}
+    tree = dict(level)
+    for ply in range(plies):
+        following = {}
+        for bits, mover in level.values():
+            pos = U.Position(U.to_board(bits))
+            other = U.OTHER[mover]
+            for m in pos.moves(mover):
+                pos.make(mover, m)
+                key = pos.canonical_key(other)[0]
+                if key not in tree and key not in following:
+                    following[key] = (dict(pos.bits), other)
+                pos.unmake(mover, m)
+        tree.update(following)
+        level = following
+    return {key: p for key, p in tree.items() if U.has_move(p[0], p[1])}
+
+def _search(job):
+    import dts
+    EV.headless()
+    key, bits, mover, seconds = job
+    board = U.to_board(bits)
+    K = dts.Konane(board, mover, time_limit=seconds, book=None)
+    pos = U.Position(board)
+    # Taken first: a search cut off by the time limit leaves pos part way
+    # down its last line
+    t = pos.canonical_key(mover)[1]
+    scored = K.deepen(pos, pos.moves(mover))
+    score, move = scored[0]
+    # Stored as the move of the canonical image
+    move = U.transform_move(move, t)
+    EV.flush()
+    return key, move[0], move[1], K.depth, score
+
+def read_progress(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    key, frm, to, depth, score = json.loads(line)
+                except ValueError:
+                    continue          # a line cut short by an interruption
+                done[key] = (frm, to, depth, score)
+    return done
+
+def _ends_line(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+def build(plies, seconds, workers, out):
+    tree = opening_tree(plies)
+    progress = out + '.progress'
+    done = read_progress(progress)
+    jobs = [(key, bits, mover, seconds) for key, (bits, mover) in tree.items()
+            if key not in done]
+    print("%d positions in the first %d plies, %d already searched" %
+          (len(tree), plies, len(tree) - len(jobs)))
+    with open(progress, 'a') as f, multiprocessing.Pool(workers) as pool:
+        if f.tell() and not _ends_line(progress):
+            f.write('\n')            # end the line an interruption cut short
+        for n, result in enumerate(pool.imap_unordered(_search, jobs)):
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            done[result[0]] = result[1:]
+            if (n + 1) % 50 == 0:
+                print("searched %d of %d" % (n + 1, len(jobs)))
+                sys.stdout.flush()
+    write_book(out, {key: done[key] for key in tree})
+    print("wrote %d positions to %s" % (len(tree), out))
+
+def write_book(path, entries):
+    keys = sorted(entries)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        f.write(struct.pack('<%dQ' % len(keys), *keys))
+        for key in keys:
+            frm, to, depth, score = entries[key]
+            f.write(ENTRY.pack(frm, to, min(depth, 255), score))
+
+#------------------------------------------------------------------------------
+#  Reading
+#
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.map, 0)
+        if magic not in (MAGIC, PLAIN_MAGIC):
+            raise ValueError("%s is not a Konane opening book" % path)
+        self.canonical = magic == MAGIC
+        self.keys = memoryview(self.map)[HEADER.size:HEADER.size + 8 * self.count].cast('Q')
+        self.entries = HEADER.size + 8 * self.count
+
+    #  Returns (move, depth, score) for pos (a konanebits Position) with
+    #  mover to move, or None.  move is a konanebits (frm, to, over) move.
+    def probe(self, pos, mover):
+        key, t = pos.canonical_key(mover) if self.canonical else (pos.key(mover), 0)
+        i = bisect.bisect_left(self.keys, key)
+        if i == self.count or self.keys[i] != key:
+            return None
+        frm, to, depth, score = ENTRY.unpack_from(self.map, self.entries + 8 * i)
+        move = U.transform_move(pos.geo.jumps[(frm, to)], U.symmetry(pos.geo).inverse[t],
+                                pos.geo)
+        return move, depth, score
+
+    def close(self):
+        self.keys.release()
+        self.map.close()
+        self.file.close()
+
+#------------------------------------------------------------------------------
+#  Command line
+#
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Konane opening book.")
+    sub = ap.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build')
+    p.add_argument('--plies', type=int, default=4)
+    p.add_argument('--time', type=float, default=2.0, help="seconds of search per position")
+    p.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    p.add_argument('--out', default='konane.book')
+    p = sub.add_parser('info')
+    p.add_argument('file', nargs='?', default='konane.book')
+    args = ap.parse_args(argv)
+    if args.command == 'build':
+        build(args.plies, args.time, args.workers, args.out)
+    else:
+        book = OpeningBook(args.file)
+        print("%s: %d positions" % (args.file, book.count))
+        book.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Konane engine client
+#
+#-------------------------------------------------------------------------
+# A player module whose moves come from a konaneserver, so the drivers
+# can use a warm engine:
+#
+#     KONANE_SERVER=/tmp/konane.sock ./konaneself.py konaneclient
+#
+# Settings come from the environment, since the drivers only pass the
+# board and colour:
+#
+#    KONANE_SERVER   Unix socket of a running './konaneserver.py --socket
+#                    PATH'.  Unset, the first Konane object starts a
+#                    private server on a pipe, shared by every Konane
+#                    object in this process and stopped at exit.
+#    KONANE_PLAYER   the player the server plays, as in konanematch
+#                    (default dts)
+#    KONANE_TIME     seconds per move; unset, the player's own limit
+#
+# EngineClient is the connection itself, for programs that want to talk
+# to a server directly: request(cmd=..., ...) sends one request and
+# returns its reply.
+#
+#------------------------------------------------------------------------------
+#
+import atexit
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import konaneevents as EV
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'konaneserver.py')
+
+class EngineClient:
+    def __init__(self, path=None):
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.process = None
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+            self.file = self.sock.makefile('rw', encoding='utf-8')
+            self.input = self.output = self.file
+        else:
+            self.sock = None
+            self.process = subprocess.Popen([sys.executable, SERVER],
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, text=True)
+            self.input, self.output = self.process.stdout, self.process.stdin
+
+    #  Replies to other requests (go replies come whenever their search
+    #  ends) are kept until asked for
+    def request(self, **request):
+        request['id'] = next(self.ids)
+        self.output.write(json.dumps(request) + '\n')
+        self.output.flush()
+        return self.reply(request['id'])
+
+    def reply(self, id):
+        pending = self.pending
+        while id not in pending:
+            line = self.input.readline()
+            if not line:
+                raise ConnectionError("konane server closed the connection")
+            reply = json.loads(line)
+            pending[reply.get('id')] = reply
+        return pending.pop(id)
+
+    def close(self):
+        if self.sock:
+            self.file.close()
+            self.sock.close()
+        elif self.process:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
+
+_client = None
+
+def shared_client():
+    global _client
+    if _client is None:
+        _client = EngineClient(os.environ.get('KONANE_SERVER'))
+        atexit.register(_client.close)
+    return _client
+
+_games = itertools.count(1)
+
+#  One Konane object contains one player's information in a Konane game.
+#  Each object is one game on the server.
+#
+class Konane:
+    def __init__(self, board, who):
+        self.board = board
+        self.who = who
+        self.other = {'x':'o', 'o':'x'}[who]
+        self.player = os.environ.get('KONANE_PLAYER', 'dts')
+        self.time = os.environ.get('KONANE_TIME')
+        self.client = shared_client()
+        self.game = '%s-%d-%d' % (who, os.getpid(), next(_games))
+
+    #  Move command.  It should return a 4-tuple containing
+    #  the move that it thinks is best for the 'who' player
+    def move(self):
+        reply = self.client.request(cmd='position', game=self.game, player=self.player,
+                                    board=[''.join(row) for row in self.board],
+                                    mover=self.who)
+        if 'error' in reply:
+            raise RuntimeError("konane server: " + reply['error'])
+        go = {'cmd': 'go', 'game': self.game}
+        if self.time: go['time'] = float(self.time)
+        reply = self.client.request(**go)
+        if 'error' in reply:
+            raise RuntimeError("konane server: " + reply['error'])
+        EV.emit(EV.MOVE, 'move', who=self.who, move=reply['move'], name=reply['name'],
+                depth=reply['depth'], nodes=reply['nodes'], seconds=reply['seconds'])
+        return tuple(reply['move'])
@@ -0,0 +1,261 @@
+#!/bin/env python3
+#
+# Konane endgame database.
+#
+# Usage: ./konaneegtb.py build [--mobility N] [--pieces N] [--games N]
+#                             [--matches FILE ...] [--canonical] [--out FILE]
+#        ./konaneegtb.py info [FILE]
+#
+#  Late in a game few pieces can still move, and the same small positions
+#  turn up again and again.  'build' collects such positions from random
+#  games and from games recorded by konanematch (every position where the
+#  two players together have at most --mobility moves, or at most
+#  --pieces pieces are left), solves each
+#  one exactly by searching its whole game tree, and writes every
+#  position it solved on the way to an endgame file:
+#
+#     win or loss for the side to move
+#     distance to the end of the game, in plies, with best play
+#
+#  Solving works back from the finished positions: a position is a win if
+#  some move leads to a loss for the opponent (reached as fast as
+#  possible), otherwise a loss (put off as long as possible).  Trees over
+#  --node-limit nodes are abandoned; everything solved inside them is
+#  still kept.
+#
+#  File layout (little-endian):
+#     header     magic, slot count, entry count, most pieces in any entry
+#     keys       slot count * 8 bytes, Position.key(mover), 0 = empty
+#     values     slot count * 2 bytes, bit 15 = win, bits 0-14 = distance
+#
+#  The keys form an open-addressing hash table (index = key & (slots-1),
+#  linear probing, at most half full), so a probe is one or two reads.
+#
+#  A position and its reflections and rotations (konanebits.Symmetry)
+#  have the same value.  With --canonical they are solved and stored
+#  once, under Position.canonical_key(mover), and the file's magic says
+#  so.  Random and recorded games seldom meet two images of one position,
+#  and the canonical key costs a few microseconds at every probe, so
+#  plain keys are the default.
+#  EndgameTable maps the file with mmap and reads it in place: opening
+#  costs nothing however large the file is.
+#
+import argparse
+import array
+import json
+import mmap
+import os.path
+import random
+import struct
+import sys
+import konanebits as U
+
+MAGIC = b'KONEGTB1'
+CANONICAL_MAGIC = b'KONEGTB2'
+HEADER = struct.Struct('<8sQQQ')
+WIN_BIT = 0x8000
+
+#------------------------------------------------------------------------------
+#  Solving
+#
+class TreeTooBig(Exception):
+    pass
+
+#  The key of a position in a table with canonical or plain keys
+#
+def table_key(pos, mover, canonical):
+    if canonical: return pos.canonical_key(mover)[0]
+    return pos.key(mover)
+
+#  Returns (win, distance) for the side to move.  memo maps table_key to
+#  the packed value; budget is a one-element list of nodes still allowed.
+#
+def solve(pos, mover, memo, budget, canonical=False):
+    key = table_key(pos, mover, canonical)
+    value = memo.get(key)
+    if value is not None:
+        return value & WIN_BIT != 0, value & ~WIN_BIT
+    budget[0] -= 1
+    if budget[0] < 0: raise TreeTooBig
+
+    other = U.OTHER[mover]
+    win = False
+    distance = 0
+    for m in pos.moves(mover):
+        pos.make(mover, m)
+        try:
+            childWin, childDistance = solve(pos, other, memo, budget, canonical)
+        finally:
+            pos.unmake(mover, m)
+        if not childWin:
+            if not win or childDistance + 1 < distance:
+                distance = childDistance + 1
+            win = True
+        elif not win:
+            distance = max(distance, childDistance + 1)
+    memo[key] = (WIN_BIT if win else 0) | distance
+    return win, distance
+
+def in_endgame(pos, mobility, maxpieces):
+    if maxpieces and pos.pieces() <= maxpieces: return True
+    return mobility and pos.count('x') + pos.count('o') <= mobility
+
+#  Move lists of the games in konanematch JSON-lines files, as
+#  (from_row, from_col, to_row, to_col) tuples.  The table holds 8x8
+#  positions only, so games played on other sizes are skipped (results
+#  without a size are from before --size, and so 8x8).
+#
+def recorded_games(paths):
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                result = json.loads(line)
+                if result.get('size', U.SIZE) != U.SIZE: continue
+                yield [tuple(m) for m in result['moves']]
+
+#  Returns (memo, roots, abandoned, most): the solved positions, how many
+#  endgame positions were met and how many of those were too big to
+#  solve, and the most pieces in any solved position.
+#
+def build(games, mobility, maxpieces, node_limit, seed, recorded=(),
+          canonical=False):
+    rng = random.Random(seed)
+    memo = {}
+    counts = [0, 0, 0]
+
+    def visit(pos, mover):
+        if in_endgame(pos, mobility, maxpieces) and \
+           table_key(pos, mover, canonical) not in memo:
+            counts[0] += 1
+            # Moves only remove pieces, so no solved position has more
+            # pieces than the largest root
+            counts[2] = max(counts[2], pos.pieces())
+            try:
+                solve(pos, mover, memo, [node_limit], canonical)
+            except TreeTooBig:
+                counts[1] += 1
+
+    for g in range(games):
+        pos = U.Position(U.populate_board())
+        mover = 'x'
+        while 1:
+            visit(pos, mover)
+            moves = pos.moves(mover)
+            if not moves: break
+            pos.make(mover, rng.choice(moves))
+            mover = U.OTHER[mover]
+
+    for game in recorded:
+        pos = U.Position(U.populate_board())
+        mover = 'x'
+        for from_row, from_col, to_row, to_col in game:
+            visit(pos, mover)
+            m = U.JUMPS.get((from_row * U.SIZE + from_col, to_row * U.SIZE + to_col))
+            if m not in pos.moves(mover): break
+            pos.make(mover, m)
+            mover = U.OTHER[mover]
+        else:
+            visit(pos, mover)
+    return memo, counts[0], counts[1], counts[2]
+
+#------------------------------------------------------------------------------
+#  File writing and reading
+#
+def write_table(path, memo, maxpieces, canonical=False):
+    slots = 1
+    while slots < 2 * len(memo): slots <<= 1
+    mask = slots - 1
+    keys = array.array('Q', bytes(8 * slots))
+    values = array.array('H', bytes(2 * slots))
+    for key, value in memo.items():
+        if key == 0: continue
+        i = key & mask
+        while keys[i]:
+            i = (i + 1) & mask
+        keys[i] = key
+        values[i] = value
+    if sys.byteorder != 'little':
+        keys.byteswap()
+        values.byteswap()
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(CANONICAL_MAGIC if canonical else MAGIC, slots, len(memo), maxpieces))
+        keys.tofile(f)
+        values.tofile(f)
+
+class EndgameTable:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, slots, self.entries, self.maxPieces = HEADER.unpack_from(self.map, 0)
+        if magic not in (MAGIC, CANONICAL_MAGIC):
+            raise ValueError("%s is not a Konane endgame file" % path)
+        self.canonical = magic == CANONICAL_MAGIC
+        self.mask = slots - 1
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.keys = view[start:start + 8 * slots].cast('Q')
+        self.values = view[start + 8 * slots:start + 10 * slots].cast('H')
+
+    #  Returns (win, distance) for the side to move, or None.  key is
+    #  the position's table_key.
+    #
+    def probe(self, key):
+        keys = self.keys
+        i = key & self.mask
+        while 1:
+            k = keys[i]
+            if k == key:
+                value = self.values[i]
+                return value & WIN_BIT != 0, value & ~WIN_BIT
+            if not k: return None
+            i = (i + 1) & self.mask
+
+    def close(self):
+        self.keys.release()
+        self.values.release()
+        self.map.close()
+        self.file.close()
+
+#------------------------------------------------------------------------------
+#  Command line
+#
+def build_command(args):
+    memo, roots, abandoned, most = build(args.games, args.mobility, args.pieces,
+                                         args.node_limit, args.seed,
+                                         recorded_games(args.matches), args.canonical)
+    write_table(args.out, memo, most, args.canonical)
+    print("solved %d positions from %d endgame roots (%d abandoned), wrote %s" %
+          (len(memo), roots, abandoned, args.out))
+
+def info_command(args):
+    table = EndgameTable(args.file)
+    print("%s: %d positions in %d slots, probed up to %d pieces, %s keys, %d bytes" %
+          (args.file, table.entries, table.mask + 1, table.maxPieces,
+           'canonical' if table.canonical else 'plain', os.path.getsize(args.file)))
+    table.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Konane endgame database.")
+    sub = ap.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build')
+    p.add_argument('--mobility', type=int, default=4,
+                   help="solve positions where both players together have at most N moves")
+    p.add_argument('--pieces', type=int, default=0,
+                   help="also solve positions with at most N pieces left")
+    p.add_argument('--games', type=int, default=2000, help="random games to collect endgames from")
+    p.add_argument('--matches', nargs='*', default=[],
+                   help="konanematch result files to collect endgames from")
+    p.add_argument('--node-limit', type=int, default=20000, help="give up on bigger trees")
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--canonical', action='store_true',
+                   help="store each position once for all its reflections and rotations")
+    p.add_argument('--out', default='konane.egtb')
+    p.set_defaults(func=build_command)
+    p = sub.add_parser('info')
+    p.add_argument('file', nargs='?', default='konane.egtb')
+    p.set_defaults(func=info_command)
+    args = ap.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
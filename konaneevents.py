@@ -0,0 +1,278 @@
+# Konane event stream
+#
+#-------------------------------------------------------------------------
+# The drivers and players report what they do as events instead of
+# printing it: a kind ('move', 'board', 'iteration', ...), a level, and
+# named fields.  Where the events go is set once, for the whole process,
+# by configure():
+#
+#    level   events above it are dropped where they are made:
+#
+#              OFF     nothing
+#              GAME    moves played, illegal moves, the winner
+#              MOVE    each player's chosen move and its score
+#              SEARCH  search progress: iterations, statistics, tables
+#              DETAIL  every available move, every scored move, boards
+#
+#    sink    what is done with the events that are kept:
+#
+#              NullSink          nothing
+#              ConsoleSink       text to stdout, as the programs printed
+#                                it before (the default)
+#              TextFileSink      the same text to a file, buffered
+#              JsonlSink         one JSON object per event, buffered
+#
+#    every   keep 1 in N events of each kind above GAME, for long runs
+#            where a sample of the detail is enough
+#
+# A program run from the shell takes its settings from the environment,
+# so the players need no options of their own:
+#
+#    KONANE_EVENTS="level=move,sink=jsonl,path=events.jsonl,every=10"
+#
+# An event costs one comparison when its level is off:
+#
+#    EV.emit(EV.MOVE, 'move', who=who, move=move, score=score)
+#
+# and where making the fields is itself work (a list of every move,
+# a score), the caller tests the level first:
+#
+#    if EV.level >= EV.DETAIL:
+#        EV.emit(EV.DETAIL, 'available', who=who, moves=[...])
+#
+# level is read as EV.level each time, since configure() changes it.
+#
+# headless() is for programs that throw the players' output away (match
+# and book workers, the server): it turns events off unless
+# KONANE_EVENTS asks for them.  Worker processes end without running
+# atexit, so their file sinks would never write what they buffered; each
+# worker job calls flush() before it returns.
+#
+#------------------------------------------------------------------------------
+#
+import atexit
+import json
+import os
+import sys
+import time
+import konaneutils as U
+
+OFF, GAME, MOVE, SEARCH, DETAIL = range(5)
+LEVELS = {'off': OFF, 'game': GAME, 'move': MOVE, 'search': SEARCH, 'detail': DETAIL}
+
+#------------------------------------------------------------------------------
+#  Text
+#
+#  How ConsoleSink and TextFileSink show each kind of event.  A kind
+#  with no entry is shown as its name and fields.
+#
+def _lines_available(e):
+    return ["available moves"] + ["%s moves  %s" % (e['who'], tuple(m)) for m in e['moves']]
+
+def _lines_scores(e):
+    return ["Score:  %s" % ((score, tuple(m)),) for score, m in e['scores']]
+
+#  Players give what they know of how they chose: a score, or the
+#  search's depth, nodes and time
+def _lines_move(e):
+    line = "%s picked move %s" % (e['who'], e.get('name') or tuple(e['move']))
+    if 'score' in e: line += " with score %s" % e['score']
+    if 'depth' in e: line += " depth %s nodes %s" % (e['depth'], e['nodes'])
+    if 'seconds' in e: line += " in %.3fs" % e['seconds']
+    if 'playouts' in e:
+        line += " after %d playouts (%.0f per second, %d reused)" % \
+                (e['playouts'], e['rate'], e['reused'])
+    return [line]
+
+def _lines_board(e):
+    rows = e['rows']
+    width = len(str(len(rows) - 1))
+    return [' ' * width + ' ' + ' '.join(U.COLUMNS[:len(rows)])] + \
+           [str(i).rjust(width) + ' ' + ' '.join(row) for i, row in enumerate(rows)]
+
+TEXT = {
+    'score':     lambda e: ["Score when move is called: %s" % e['score']],
+    'available': _lines_available,
+    'scores':    _lines_scores,
+    'move':      _lines_move,
+    'book':      lambda e: ["%s book move %s searched to depth %s with score %s" %
+                            (e['who'], tuple(e['move']), e['depth'], e['score'])],
+    'iteration': lambda e: ["depth %d best %s score %s nodes %d time %.3f" %
+                            (e['depth'], tuple(e['best']), e['score'], e['nodes'],
+                             e['seconds'])],
+    'visits':    lambda e: ["Move %s games %d won %.3f" % (tuple(m), games, won)
+                            for m, games, won in e['children']],
+    'ponder':    lambda e: ["ponder hit, searched to depth %d" % e['depth']],
+    'worker':    lambda e: ["worker %d depth %d nodes %d tt %s" %
+                            (e['worker'], e['depth'], e['nodes'], e['tt'])],
+    'stats':     lambda e: ["search stats %s" % e['stats']],
+    'tables':    lambda e: ["transposition table %s" % e['tt'],
+                            "cutoffs %s on first move %.3f" % (e['cutoffs'], e['firstMove'])],
+    'board':     _lines_board,
+    'played':    lambda e: ["%s moves %s" % (e['who'], e['name'])],
+    'illegal':   lambda e: ["Illegal Move" + (" forfeited" if e.get('forfeited') else "")],
+    'winner':    lambda e: ["Winner is: %s" % e['winner']],
+}
+
+def text(event):
+    show = TEXT.get(event['kind'])
+    if show: return show(event)
+    return [event['kind'] + ' ' + ' '.join('%s=%s' % (k, v) for k, v in event.items()
+                                           if k not in ('kind', 'level'))]
+
+#------------------------------------------------------------------------------
+#  Sinks
+#
+#  write(event) gets each event kept, a dict with 'kind' and 'level'
+#  among its fields.  The file sinks buffer whole lines and write them
+#  together.  A forked child (a match or book worker) starts with its
+#  parent's unwritten lines, which are the parent's to write, so it
+#  drops them.
+#
+class NullSink:
+    def write(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+#  stream None is whatever sys.stdout is at the time, so a caller's
+#  contextlib.redirect_stdout still catches the text
+class ConsoleSink:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, event):
+        stream = self.stream or sys.stdout
+        stream.write('\n'.join(text(event)) + '\n')
+
+    def flush(self):
+        (self.stream or sys.stdout).flush()
+
+    def close(self):
+        self.flush()
+
+class _FileSink:
+    def __init__(self, path, buffer=256):
+        self.path = path
+        self.buffer = buffer
+        self.lines = []
+        self.pid = os.getpid()
+        self.file = open(path, 'a')
+
+    def write(self, event):
+        if self.pid != os.getpid():
+            self.lines = []
+            self.pid = os.getpid()
+        self.lines.extend(self.format(event))
+        if len(self.lines) >= self.buffer:
+            self.flush()
+
+    def flush(self):
+        if self.pid != os.getpid(): return
+        if self.lines:
+            self.file.write('\n'.join(self.lines) + '\n')
+            self.lines = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class TextFileSink(_FileSink):
+    def format(self, event):
+        return text(event)
+
+#  Each line also has the wall clock time and the process id
+class JsonlSink(_FileSink):
+    def format(self, event):
+        event['time'] = round(time.time(), 6)
+        event['pid'] = self.pid
+        return [json.dumps(event)]
+
+SINKS = {'null': NullSink, 'console': ConsoleSink, 'text': TextFileSink,
+         'jsonl': JsonlSink}
+
+#------------------------------------------------------------------------------
+#  The process's stream
+#
+level = DETAIL
+sink = ConsoleSink()
+every = 1
+_counts = {}
+
+def emit(lvl, kind, **fields):
+    if lvl > level: return
+    if every > 1 and lvl > GAME:
+        n = _counts.get(kind, 0)
+        _counts[kind] = n + 1
+        if n % every: return
+    fields['kind'] = kind
+    fields['level'] = lvl
+    sink.write(fields)
+
+def flush():
+    sink.flush()
+
+#  A list-of-lists board as a 'board' event, marks and all
+def show_board(board, lvl=DETAIL):
+    if lvl <= level:
+        emit(lvl, 'board', rows=[''.join(row) for row in board])
+
+#  Changes only what is given.  sink is a sink object; the one it
+#  replaces is closed.  (The arguments have the names of the settings,
+#  so they are set through globals().)
+def configure(level=None, sink=None, every=None):
+    state = globals()
+    if sink is not None and sink is not state['sink']:
+        state['sink'].close()
+        state['sink'] = sink
+    if level is not None:
+        state['level'] = LEVELS[level] if isinstance(level, str) else level
+    if every is not None:
+        state['every'] = max(1, every)
+        _counts.clear()
+
+#  'level=move,sink=jsonl,path=events.jsonl,every=10' -> configure()
+#  arguments.  The file sinks need a path.
+def parse_spec(spec):
+    options = dict(item.partition('=')[::2] for item in spec.split(',') if item)
+    unknown = set(options) - {'level', 'sink', 'path', 'every', 'buffer'}
+    if unknown:
+        raise ValueError("unknown event setting %s" % ', '.join(sorted(unknown)))
+    settings = {}
+    if 'level' in options:
+        if options['level'] not in LEVELS:
+            raise ValueError("event level must be one of %s" % ', '.join(LEVELS))
+        settings['level'] = LEVELS[options['level']]
+    if 'sink' in options:
+        kind = SINKS.get(options['sink'])
+        if kind is None:
+            raise ValueError("event sink must be one of %s" % ', '.join(SINKS))
+        if issubclass(kind, _FileSink):
+            if not options.get('path'):
+                raise ValueError("the %s sink needs a path" % options['sink'])
+            settings['sink'] = kind(options['path'], int(options.get('buffer', 256)))
+        else:
+            settings['sink'] = kind()
+    if 'every' in options:
+        settings['every'] = int(options['every'])
+    return settings
+
+def configure_spec(spec):
+    configure(**parse_spec(spec))
+
+def headless():
+    if not os.environ.get('KONANE_EVENTS'):
+        configure(level=OFF)
+
+def close():
+    sink.close()
+
+atexit.register(close)
+
+if os.environ.get('KONANE_EVENTS'):
+    configure_spec(os.environ['KONANE_EVENTS'])
@@ -0,0 +1,246 @@
+#!/bin/env python3
+#
+# Konane headless match runner.
+#
+# Usage: ./konanematch.py moduleA moduleB [options]
+#
+#  Plays moduleA against moduleB over many games in a process pool, with
+#  no board printing, and streams one JSON line per game to a results
+#  file.  Any module with a Konane(board, who) class can play; keyword
+#  arguments for the constructor follow a colon, e.g.
+#
+#     ./konanematch.py dts:time_limit=0.2 sps --games 400 --workers 8
+#
+#  Games come in pairs: both games of a pair start from the same random
+#  opening (--random-plies moves from the standard start) with the
+#  colours swapped, so deterministic players don't replay one game.
+#  --size plays on a bigger or smaller square board.  --record also
+#  appends every game to a compact binary game record file (konanerecord).
+#  --profile PREFIX profiles the players' moves in every game and writes
+#  the results together at the end, with --sample MS by sampling
+#  (konaneprofile).
+#
+#  At the end (and every --report games) it prints A's score and Elo
+#  difference with a 95% error bar.  With --sprt it runs a sequential
+#  probability ratio test of H0: elo = elo0 against H1: elo = elo1 and
+#  stops as soon as either hypothesis is accepted.
+#
+import argparse
+import ast
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+import konaneevents as EV
+import konaneprofile as P
+import konanerecord as R
+import konaneutils as U
+
+#------------------------------------------------------------------------------
+#  Playing one game
+#
+
+#  'dts:time_limit=0.2,max_depth=6' -> ('dts', {'time_limit': 0.2, 'max_depth': 6})
+#
+def parse_player(spec):
+    name, _, args = spec.partition(':')
+    kwargs = {}
+    for arg in filter(None, args.split(',')):
+        key, _, value = arg.partition('=')
+        kwargs[key] = ast.literal_eval(value)
+    return name, kwargs
+
+#  Returns a dict describing the game.  players maps 'x' and 'o' to
+#  (module name, kwargs).  The board is changed in place, because the
+#  Konane objects keep a reference to it, as they do in the drivers.
+#  A konaneprofile Profiler given as profiler runs the players' moves.
+#
+def play_game(players, opening_seed, random_plies, size=8, profiler=None, game=0):
+    board = U.populate_board(size)
+    mover, other = 'x', 'o'
+    moves = []
+    rng = random.Random(opening_seed)
+    for i in range(random_plies):
+        succ = U.genmoves(board, mover)
+        if not succ: break
+        n = rng.choice(succ)
+        board[:] = n.b
+        moves.append(n.move)
+        mover, other = other, mover
+
+    engines = {}
+    for p in ('x', 'o'):
+        name, kwargs = players[p]
+        engines[p] = __import__(name).Konane(board, p, **kwargs)
+
+    reason = 'no moves'
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        while 1:
+            legal = {n.move: n for n in U.genmoves(board, mover)}
+            if not legal: break
+            if profiler:
+                move = tuple(profiler.move(engines[mover].move, mover, board,
+                                           len(moves), game))
+            else:
+                move = tuple(engines[mover].move())
+            if move not in legal:
+                reason = 'illegal move'
+                moves.append(move)
+                break
+            board[:] = legal[move].b
+            moves.append(move)
+            mover, other = other, mover
+            out.seek(0)
+            out.truncate()
+
+    # The player to move has no legal move, or made an illegal one
+    return {'winner': other, 'reason': reason, 'plies': len(moves),
+            'moves': moves, 'seconds': time.time() - start}
+
+def _play(job):
+    # The players' events would be thrown away with their other output
+    EV.headless()
+    game, playerA, playerB, random_plies, seed, size, sample = job
+    if game % 2 == 0:
+        players = {'x': playerA, 'o': playerB}
+    else:
+        players = {'x': playerB, 'o': playerA}
+    # sample is None when not profiling, 0 for cProfile
+    profiler = P.Profiler(sample) if sample is not None else None
+    result = play_game(players, seed * 1000003 + game // 2, random_plies, size,
+                       profiler, game)
+    if profiler:
+        result['profile'] = profiler.export()
+    result['game'] = game
+    result['size'] = size
+    result['x'] = players['x'][0]
+    result['o'] = players['o'][0]
+    result['a_color'] = 'x' if game % 2 == 0 else 'o'
+    result['a_score'] = 1 if result['winner'] == result['a_color'] else 0
+    EV.flush()
+    return result
+
+#------------------------------------------------------------------------------
+#  Statistics
+#
+#  Konane has no draws, so every game scores 1 or 0 for A.
+#
+
+def elo_from_score(p):
+    p = min(max(p, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / p - 1)
+
+def score_from_elo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+#  Elo difference of A over B, and the 95% interval around it.  The
+#  interval is Wilson's for the score, which, unlike the normal
+#  approximation, still has width when A won or lost every game.
+#
+def elo_interval(wins, games, z=1.96):
+    p = wins / games
+    spread = z * z / games
+    centre = (p + spread / 2) / (1 + spread)
+    half = z * math.sqrt(p * (1 - p) / games + spread / (4 * games)) / (1 + spread)
+    return (elo_from_score(p), elo_from_score(centre - half),
+            elo_from_score(centre + half))
+
+#  Log-likelihood ratio of H1: elo = elo1 against H0: elo = elo0 for a
+#  run of Bernoulli games.  The test stops when it leaves (lower, upper).
+#
+def sprt_llr(wins, losses, elo0, elo1):
+    p0, p1 = score_from_elo(elo0), score_from_elo(elo1)
+    return wins * math.log(p1 / p0) + losses * math.log((1 - p1) / (1 - p0))
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+#------------------------------------------------------------------------------
+#  Match
+#
+def report(nameA, nameB, wins, games, llr=None, bounds=None):
+    elo, lo, hi = elo_interval(wins, games)
+    line = "%s vs %s: %d games, %s scores %.3f, elo %+.1f [%+.1f, %+.1f]" % \
+           (nameA, nameB, games, nameA, wins / games, elo, lo, hi)
+    if llr is not None:
+        line += ", LLR %.2f (%.2f, %.2f)" % (llr, bounds[0], bounds[1])
+    print(line)
+    sys.stdout.flush()
+
+def match(args):
+    playerA, playerB = parse_player(args.a), parse_player(args.b)
+    bounds = sprt_bounds(args.alpha, args.beta)
+    sample = None
+    if args.profile:
+        sample = args.sample / 1000 if args.sample else 0
+    jobs = [(g, playerA, playerB, args.random_plies, args.seed, args.size, sample)
+            for g in range(args.games)]
+    wins = games = 0
+    llr = None
+    verdict = None
+    record = R.GameWriter(args.record) if args.record else None
+    profiler = P.Profiler(sample) if args.profile else None
+    with open(args.out, 'a') as out, multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(_play, jobs):
+            data = result.pop('profile', None)
+            if data: profiler.merge(data)
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            if record:
+                record.write(result['moves'], result['winner'], result['reason'], args.size)
+            games += 1
+            wins += result['a_score']
+            if args.sprt:
+                llr = sprt_llr(wins, games - wins, args.elo0, args.elo1)
+                if llr >= bounds[1]:
+                    verdict = "H1 accepted: %s is at least %g elo stronger" % (playerA[0], args.elo1)
+                elif llr <= bounds[0]:
+                    verdict = "H0 accepted: %s is not %g elo stronger" % (playerA[0], args.elo1)
+            if verdict or games % args.report == 0:
+                report(playerA[0], playerB[0], wins, games, llr, bounds if args.sprt else None)
+            if verdict:
+                pool.terminate()
+                break
+        else:
+            if games % args.report:
+                report(playerA[0], playerB[0], wins, games, llr, bounds if args.sprt else None)
+    if record: record.close()
+    if profiler:
+        written = profiler.write(args.profile, "%s vs %s, %d games" %
+                                 (playerA[0], playerB[0], games))
+        print("profile written to", ', '.join(written))
+    if verdict:
+        print(verdict)
+    elif args.sprt:
+        print("SPRT inconclusive after", games, "games")
+    return wins, games
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Play two Konane player modules against each other.")
+    ap.add_argument('a', help="player A, e.g. dts or dts:time_limit=0.2")
+    ap.add_argument('b', help="player B")
+    ap.add_argument('--games', type=int, default=100)
+    ap.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    ap.add_argument('--out', default='match.jsonl', help="JSON-lines results file (appended to)")
+    ap.add_argument('--record', help="binary game record file (appended to)")
+    ap.add_argument('--profile', metavar='PREFIX', help="profile the players' moves into PREFIX.*")
+    ap.add_argument('--sample', type=float, metavar='MS',
+                    help="with --profile, sample the stack every MS ms instead of cProfile")
+    ap.add_argument('--random-plies', type=int, default=4)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--size', type=int, default=8, help="board width and height (even)")
+    ap.add_argument('--report', type=int, default=50, help="print the standings every N games")
+    ap.add_argument('--sprt', action='store_true')
+    ap.add_argument('--elo0', type=float, default=0.0)
+    ap.add_argument('--elo1', type=float, default=20.0)
+    ap.add_argument('--alpha', type=float, default=0.05)
+    ap.add_argument('--beta', type=float, default=0.05)
+    match(ap.parse_args(argv))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Konane flat-board negamax
+#
+#-------------------------------------------------------------------------
+# The search the sps and player1 players share: negamax alpha-beta with
+# principal variation search over konaneutils' flat boards and packed
+# moves.
+#
+# FlatNegamax is a mixin for a player class that sets self.who,
+# self.other and self.order (a konaneorder.MoveOrder over
+# packed_index).  The search recurses through self.negamax, so a caller
+# can wrap that attribute (konanebench counts nodes that way).
+#
+#------------------------------------------------------------------------------
+#
+import konaneutils as U
+
+WIN = 100000000
+INF = WIN + 1
+
+class FlatNegamax:
+    # The scoring function on a flat board (konaneutils.flatten), as the
+    # search keeps them: our moves minus the other player's
+    def flat_score(self, fb):
+        return U.flat_count(fb, self.who) - U.flat_count(fb, self.other)
+
+    # Negamax alpha-beta with principal variation search.  Scores are
+    # from the point of view of 'who', the side to move; a side with no
+    # moves has lost, which scores -WIN, and the root window (-INF, INF)
+    # is wide enough to hold that.  After the first move the others are
+    # searched with a null window and only re-searched if they beat it.
+    # The board is flat and the moves packed integers, and a successor
+    # board is only made for a move when it is searched, so nothing is
+    # built for the moves a cutoff skips.
+    def negamax(self, who, board, alpha, beta, ran, depth):
+        if ran == depth:
+            if U.flat_done(board, who):
+                return -WIN
+            score = self.flat_score(board)
+            return score if who == self.who else -score
+        moves = list(U.flat_jumps(board, who))
+        if not moves:
+            return -WIN
+        moves = self.order.order(moves, ran)
+        other = {'x':'o', 'o':'x'}[who]
+        best = -INF
+        for n, m in enumerate(moves):
+            x = U.flat_make(board, who, m)
+            s = ran + 1
+            if n == 0:
+                cScore = -self.negamax(other, x, -beta, -alpha, s, depth)
+            else:
+                cScore = -self.negamax(other, x, -alpha - 1, -alpha, s, depth)
+                if alpha < cScore < beta:
+                    cScore = -self.negamax(other, x, -beta, -alpha, s, depth)
+            if cScore > best:
+                best = cScore
+                if best > alpha: alpha = best
+                if alpha >= beta:
+                    self.order.cutoff(m, ran, depth - ran, n)
+                    break
+        return best
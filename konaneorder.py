@@ -0,0 +1,126 @@
+# Move ordering for Konane search
+#
+#-------------------------------------------------------------------------
+# Alpha-beta cuts off sooner the earlier it sees the best move, so the
+# players sort their moves before searching them.  A MoveOrder object
+# belongs to one player and keeps what the search learned:
+#
+#    killers   for each ply, the last two moves that caused a cutoff there
+#    history   butterfly table: for each (from, to) square pair, how much
+#              cutoff work the move has done anywhere in the tree
+#
+# and, optionally, a cheap static pre-sort (longer jumps first) that
+# breaks ties between moves history knows nothing about.
+#
+# Moves are identified by their (from, to) squares, which the player
+# supplies as an index function:
+#
+#    bit_index   for konanebits (frm, to, over) moves
+#    move_index  for konaneutils (from_row, from_col, to_row, to_col) moves
+#    node_index  for konaneutils Node objects
+#    packed_index for konaneutils packed moves, which are their own index
+#
+# The tables are sized for the board (size x size, 8 by default); the
+# index functions are given the board's size as well as the move.
+#
+# The object also counts cutoffs, and how many of them came from the
+# first move searched, which is the usual measure of ordering quality.
+#
+#------------------------------------------------------------------------------
+#
+def bit_index(move, size):
+    return move[0] * size * size + move[1]
+
+def move_index(move, size):
+    from_row, from_col, to_row, to_col = move
+    return (from_row * size + from_col) * size * size + to_row * size + to_col
+
+def node_index(node, size):
+    from_row, from_col, to_row, to_col = node.move
+    return (from_row * size + from_col) * size * size + to_row * size + to_col
+
+def packed_index(move, size):
+    return move
+
+#  Number of hops for each (from, to) pair; 0 for pairs that are not jumps.
+#  Built once per board size.
+#
+_static = {}
+
+def static_table(size):
+    static = _static.get(size)
+    if static is None:
+        squares = size * size
+        static = [0] * (squares * squares)
+        for f in range(squares):
+            for t in range(squares):
+                dr, dc = abs(f // size - t // size), abs(f % size - t % size)
+                if (dr == 0) != (dc == 0) and (dr + dc) % 2 == 0:
+                    static[f * squares + t] = (dr + dc) // 2
+        _static[size] = static
+    return static
+
+class MoveOrder:
+    def __init__(self, index=bit_index, killers=True, history=True,
+                 presort=False, size=8):
+        self.index = index
+        self.size = size
+        self.useKillers = killers
+        self.useHistory = history
+        self.presort = presort
+        self.history = [0] * (size ** 4)
+        self.killers = {}
+        self.cutoffs = 0
+        self.firstCutoffs = 0
+
+    #  Called at the start of every move's search.  Killers belong to the
+    #  old tree, and history is halved so that recent experience counts
+    #  most.
+    def new_search(self):
+        self.killers = {}
+        self.history = [h >> 1 for h in self.history]
+
+    #  Sort moves in place, best first: the 'first' move (usually from
+    #  the transposition table), then the killers for this ply, then by
+    #  history score and static score.
+    def order(self, moves, ply, first=None):
+        index = self.index
+        size = self.size
+        history = self.history if self.useHistory else None
+        static = static_table(size) if self.presort else None
+        k0 = k1 = -1
+        if self.useKillers:
+            killers = self.killers.get(ply)
+            if killers: k0, k1 = killers
+        f = index(first, size) if first is not None else -1
+
+        def score(m):
+            i = index(m, size)
+            if i == f: return 1 << 62
+            if i == k0: return 1 << 61
+            if i == k1: return 1 << 60
+            s = 0
+            if history: s = history[i] << 2
+            if static: s += static[i]
+            return s
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    #  Record that 'move', the n-th move searched (from 0) at this ply with
+    #  'depth' plies still to go, caused a cutoff.
+    def cutoff(self, move, ply, depth, n):
+        self.cutoffs += 1
+        if n == 0: self.firstCutoffs += 1
+        i = self.index(move, self.size)
+        self.history[i] += depth * depth
+        killers = self.killers.get(ply)
+        if not killers:
+            self.killers[ply] = [i, -1]
+        elif killers[0] != i:
+            killers[1] = killers[0]
+            killers[0] = i
+
+    def first_move_rate(self):
+        if not self.cutoffs: return 0.0
+        return self.firstCutoffs / self.cutoffs
@@ -0,0 +1,284 @@
+# Konane profiling
+#
+#-------------------------------------------------------------------------
+# Profiles the players' moves and nothing else, so the drivers' boards
+# and printing stay out of the results.  konaneself and konanematch use
+# it with --profile PREFIX:
+#
+#     cProfile (the default): every call is timed.  Writes
+#
+#        PREFIX.prof          all the moves, for pstats, snakeviz, ...
+#        PREFIX.PHASE.prof    the moves of one game phase
+#        PREFIX.txt           the report below
+#
+#     sampling (--sample MS): every MS milliseconds of CPU time the
+#        stack is recorded, which costs far less than timing every call.
+#        Writes
+#
+#        PREFIX.collapsed     one line per stack, 'phase;frame;frame N',
+#                             the input of flamegraph.pl and speedscope;
+#                             the game phase is the bottom frame
+#        PREFIX.txt           the report below
+#
+#  The report has, for each game phase and for each move, the time taken
+#  and how often the rules routines and the search ran (COUNTED; with
+#  cProfile, the calls, where each step of a generator counts as one;
+#  with sampling, the samples that were inside each), and for each phase
+#  the functions that took the most time.
+#
+#  A position's phase is how full the board is: opening while more than
+#  7/8 of the squares hold pieces, middlegame to 5/8, endgame after.
+#
+#  Sampling uses the SIGPROF interval timer where there is one and the
+#  moves run on the main thread, and otherwise a thread that looks at
+#  the stack of the thread running the move.  The kernel may round MS up
+#  to its clock tick, and the sampling thread waits for the profiled one
+#  to let go of the interpreter, so the report gives the samples
+#  actually taken.
+#
+#  A Profiler's results can be exported and merged into another's, so a
+#  match's worker processes each profile their own games and the parent
+#  writes the files.
+#
+#------------------------------------------------------------------------------
+#
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+
+PHASES = ('opening', 'middlegame', 'endgame')
+
+COUNTED = ('genmoves', 'moveable', 'make_succ', 'dests_from', 'jumppath',
+           'minimax', 'negamax', 'jumps', 'make_jump', 'count_moves',
+           'gameDone', 'flat_jumps', 'flat_make', 'flat_count', 'bitmoves',
+           'bitcount', 'frontier')
+
+TOP = 15
+
+def phase(board):
+    size = len(board)
+    pieces = sum(1 for row in board for sq in row if sq in 'xoXO')
+    if 8 * pieces > 7 * size * size: return 'opening'
+    if 8 * pieces > 5 * size * size: return 'middlegame'
+    return 'endgame'
+
+def frame_name(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return '%s:%s' % (os.path.splitext(os.path.basename(code.co_filename))[0], name)
+
+#  pstats.Stats takes anything with create_stats() and a stats dict,
+#  which is how exported stats are read back
+class _Raw:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+class Profiler:
+    def __init__(self, sample=None):
+        self.sample = sample
+        self.moves = []
+        self.phaseStats = {}
+        self.stacks = {}
+
+    #  Run fn (a player's move method) under the profiler.  The position
+    #  it moves from and who moves are for the report; game numbers the
+    #  games of a match.
+    def move(self, fn, who, board, ply, game=0):
+        record = {'game': game, 'ply': ply, 'who': who, 'phase': phase(board),
+                  'player': getattr(getattr(fn, '__self__', None), '__module__', '?')}
+        start = time.perf_counter()
+        if self.sample:
+            result, counts = self._sampled(fn, record['phase'])
+        else:
+            result, counts = self._profiled(fn, record['phase'])
+        record['seconds'] = time.perf_counter() - start
+        record['counts'] = counts
+        self.moves.append(record)
+        return result
+
+    def _profiled(self, fn, ph):
+        profile = cProfile.Profile()
+        result = profile.runcall(fn)
+        stats = pstats.Stats(profile)
+        counts = {}
+        for (filename, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+            if name in COUNTED:
+                counts[name] = counts.get(name, 0) + nc
+        if ph in self.phaseStats:
+            self.phaseStats[ph].add(stats)
+        else:
+            self.phaseStats[ph] = stats
+        return result, counts
+
+    #  The stack below _call, leaf last, as frame names
+    def _sampled(self, fn, ph):
+        stacks = {}
+        stop = _call.__code__
+
+        def record(frame):
+            codes = []
+            while frame is not None and frame.f_code is not stop:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if frame is None: return      # not inside the move
+            codes = tuple(codes)
+            stacks[codes] = stacks.get(codes, 0) + 1
+
+        sampler = _Sampler(self.sample, record)
+        sampler.start()
+        try:
+            result = _call(fn)
+        finally:
+            sampler.stop()
+        counts = {}
+        names = {}
+        for codes, n in stacks.items():
+            key = (ph,) + tuple(names.get(c) or names.setdefault(c, frame_name(c))
+                                for c in reversed(codes))
+            self.stacks[key] = self.stacks.get(key, 0) + n
+            for name in {c.co_name for c in codes if c.co_name in COUNTED}:
+                counts[name] = counts.get(name, 0) + n
+        counts['samples'] = sum(stacks.values())
+        return result, counts
+
+    #  Everything recorded, as plain data that pickles
+    def export(self):
+        return {'moves': self.moves, 'stacks': self.stacks,
+                'stats': {ph: s.stats for ph, s in self.phaseStats.items()}}
+
+    def merge(self, data):
+        self.moves.extend(data['moves'])
+        for key, n in data['stacks'].items():
+            self.stacks[key] = self.stacks.get(key, 0) + n
+        for ph, raw in data['stats'].items():
+            if ph in self.phaseStats:
+                self.phaseStats[ph].add(_Raw(raw))
+            else:
+                self.phaseStats[ph] = pstats.Stats(_Raw(raw))
+
+    #  Write the files for PREFIX; returns their names
+    def write(self, prefix, title=''):
+        written = []
+        if self.phaseStats:
+            total = None
+            for ph in PHASES:
+                if ph not in self.phaseStats: continue
+                self.phaseStats[ph].dump_stats('%s.%s.prof' % (prefix, ph))
+                written.append('%s.%s.prof' % (prefix, ph))
+                if total is None: total = pstats.Stats(_Raw(dict(self.phaseStats[ph].stats)))
+                else: total.add(self.phaseStats[ph])
+            total.dump_stats(prefix + '.prof')
+            written.insert(0, prefix + '.prof')
+        if self.stacks:
+            with open(prefix + '.collapsed', 'w') as f:
+                for key, n in sorted(self.stacks.items()):
+                    f.write('%s %d\n' % (';'.join(key), n))
+            written.append(prefix + '.collapsed')
+        with open(prefix + '.txt', 'w') as f:
+            f.write(self.report(title))
+        written.append(prefix + '.txt')
+        return written
+
+    def report(self, title=''):
+        out = io.StringIO()
+        kind = 'sampling every %g ms' % (self.sample * 1000) if self.sample else 'cProfile'
+        print("%s%d moves, %s" % (title + ', ' if title else '', len(self.moves), kind),
+              file=out)
+        names = [n for n in COUNTED if any(n in m['counts'] for m in self.moves)]
+        if self.sample: names.append('samples')
+        what = "samples inside" if self.sample else "calls of"
+        print("\nBy phase: moves, seconds, and %s each routine" % what, file=out)
+        header = "%-10s %5s %8s" % ('phase', 'moves', 'seconds') + \
+                 ''.join(' %11s' % n for n in names)
+        print(header, file=out)
+        for ph in PHASES:
+            moves = [m for m in self.moves if m['phase'] == ph]
+            if not moves: continue
+            print("%-10s %5d %8.3f" % (ph, len(moves), sum(m['seconds'] for m in moves)) +
+                  ''.join(' %11d' % sum(m['counts'].get(n, 0) for m in moves)
+                          for n in names), file=out)
+
+        print("\nBy move", file=out)
+        print("%4s %4s %-3s %-8s %-10s %8s" % ('game', 'ply', 'who', 'player', 'phase',
+                                              'seconds') +
+              ''.join(' %11s' % n for n in names), file=out)
+        for m in self.moves:
+            print("%4d %4d %-3s %-8s %-10s %8.3f" % (m['game'], m['ply'], m['who'],
+                                                    m['player'][:8], m['phase'],
+                                                    m['seconds']) +
+                  ''.join(' %11d' % m['counts'].get(n, 0) for n in names), file=out)
+
+        for ph in PHASES:
+            if ph in self.phaseStats:
+                print("\nTop functions in the %s, by own time" % ph, file=out)
+                stats = self.phaseStats[ph]
+                stats.stream = out
+                stats.sort_stats('tottime').print_stats(TOP)
+            elif any(key[0] == ph for key in self.stacks):
+                print("\nTop functions in the %s, by samples" % ph, file=out)
+                own, inside = {}, {}
+                for key, n in self.stacks.items():
+                    if key[0] != ph: continue
+                    own[key[-1]] = own.get(key[-1], 0) + n
+                    for name in set(key[1:]):
+                        inside[name] = inside.get(name, 0) + n
+                print("%8s %8s  %s" % ('own', 'inside', 'function'), file=out)
+                for name in sorted(inside, key=lambda k: (-own.get(k, 0), -inside[k]))[:TOP]:
+                    print("%8d %8d  %s" % (own.get(name, 0), inside[name], name), file=out)
+        return out.getvalue()
+
+#  The frame every sampled stack is cut at
+def _call(fn):
+    return fn()
+
+#------------------------------------------------------------------------------
+#  Samplers
+#
+#  record(frame) is called with the current frame of the thread that
+#  called start() every 'interval' seconds: of the process's CPU time
+#  from the SIGPROF timer, of wall time from the sampling thread.
+#  Signal handlers run on the main thread, so the timer is only used
+#  there.
+#
+class _Sampler:
+    def __init__(self, interval, record):
+        self.interval = interval
+        self.record = record
+        self.useTimer = hasattr(signal, 'setitimer') and \
+                        threading.current_thread() is threading.main_thread()
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        self.running = True
+        if self.useTimer:
+            self.previous = signal.signal(signal.SIGPROF, self._handler)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.target = threading.get_ident()
+            self.thread = threading.Thread(target=self._poll, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.useTimer:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self.previous)
+        else:
+            self.thread.join()
+
+    def _handler(self, signum, frame):
+        if self.running: self.record(frame)
+
+    def _poll(self):
+        while self.running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.target)
+            if frame is not None and self.running: self.record(frame)
@@ -0,0 +1,408 @@
+#!/bin/env python3
+#
+# Konane game records.
+#
+# Usage: ./konanerecord.py info FILE
+#        ./konanerecord.py show FILE [GAME ...]
+#        ./konanerecord.py convert MATCH.jsonl ... --out FILE
+#        ./konanerecord.py selftest
+#
+#  A compact binary file of whole games, for archives of many games.
+#  Every game starts from the standard position with x to move, so a
+#  game is its moves, and a move is stored as its index among the
+#  mover's legal moves in the order konaneutils.jumps (and so genmoves)
+#  produces them: one byte for a move on any board up to 8x8.
+#
+#  File layout (little-endian):
+#     header     magic
+#     games      one after another:
+#                  size     board width and height, 1 byte
+#                  flags    1 byte: bit 0 = o won, bit 1 = two-byte
+#                           codes, bits 2-7 = index of the reason the
+#                           game ended in REASONS
+#                  plies    2 bytes
+#                  codes    plies codes, 1 or 2 bytes each
+#
+#  A game ended by an illegal move does not store that move; the mover
+#  of the ply after the last stored move is the loser.
+#
+#  Each game's length is in its header, so games can be skipped without
+#  replaying them.  Beside the file an index FILE.idx holds the offset of
+#  every game (8 bytes each), so game n is found with one seek.
+#  GameWriter appends to both; when the index is missing or behind the
+#  file, it is rebuilt from the headers, and a game cut short by an
+#  interruption is dropped.
+#
+#  GameReader reads games one at a time as Game objects, without loading
+#  the file; a Game's moves are decoded only when asked for.
+#
+import argparse
+import array
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import konaneutils as U
+
+MAGIC = b'KONREC1\n'
+GAME = struct.Struct('<BBH')
+INDEX = struct.Struct('<Q')
+REASONS = ('no moves', 'illegal move')
+WIDE = 0x02
+OTHER = {'x': 'o', 'o': 'x'}
+
+#------------------------------------------------------------------------------
+#  Games
+#
+class Game:
+    def __init__(self, number, size, winner, reason, codes):
+        self.number = number
+        self.size = size
+        self.winner = winner
+        self.reason = reason
+        self.codes = codes
+        self.plies = len(codes)
+
+    #  Yields (board, mover, move) for every ply: the position before the
+    #  move as a list-of-lists board, the side to move, and the move as a
+    #  (from_row, from_col, to_row, to_col) tuple.  Consecutive boards
+    #  share the rows the move did not touch, so copy a board before
+    #  changing it.
+    def replay(self):
+        board = U.populate_board(self.size)
+        mover = 'x'
+        for ply, code in enumerate(self.codes):
+            moves = list(U.jumps(board, mover))
+            if code >= len(moves):
+                raise ValueError("game %d ply %d: move %d of %d" %
+                                 (self.number, ply, code, len(moves)))
+            move = moves[code]
+            yield board, mover, move
+            board = U.make_jump(board, mover, move).b
+            mover = OTHER[mover]
+
+    def moves(self):
+        for board, mover, move in self.replay():
+            yield move
+
+    #  The position after the last move, and the side to move in it
+    def final(self):
+        board, mover = U.populate_board(self.size), 'x'
+        for before, player, move in self.replay():
+            board, mover = U.make_jump(before, player, move).b, OTHER[player]
+        return board, mover
+
+#  The codes of a game given as moves.  Stops at the first move that is
+#  not legal, and returns (codes, number of moves encoded).
+#
+def encode_game(moves, size=8):
+    board = U.populate_board(size)
+    mover = 'x'
+    codes = []
+    for move in moves:
+        move = tuple(move)
+        legal = list(U.jumps(board, mover))
+        if move not in legal: break
+        codes.append(legal.index(move))
+        board = U.make_jump(board, mover, move).b
+        mover = OTHER[mover]
+    return codes, len(codes)
+
+def pack_game(size, winner, reason, codes):
+    wide = bool(codes) and max(codes) > 255
+    flags = (winner == 'o') | (WIDE if wide else 0) | REASONS.index(reason) << 2
+    data = array.array('H' if wide else 'B', codes)
+    if wide and sys.byteorder != 'little': data.byteswap()
+    return GAME.pack(size, flags, len(codes)) + data.tobytes()
+
+def _codes_size(flags, plies):
+    return plies * (2 if flags & WIDE else 1)
+
+#------------------------------------------------------------------------------
+#  Index
+#
+#  Offsets of the complete games in the file, found from the headers
+#
+def scan_offsets(path):
+    offsets = []
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a Konane game record file" % path)
+        end = os.fstat(f.fileno()).st_size
+        offset = len(MAGIC)
+        while offset + GAME.size <= end:
+            f.seek(offset)
+            size, flags, plies = GAME.unpack(f.read(GAME.size))
+            following = offset + GAME.size + _codes_size(flags, plies)
+            if following > end: break
+            offsets.append(offset)
+            offset = following
+    return offsets
+
+#  The index is good when its last game ends where the file does
+#
+def _index_matches(path, index_path):
+    if not os.path.exists(index_path): return False
+    count = os.path.getsize(index_path) // INDEX.size
+    if os.path.getsize(index_path) % INDEX.size: return False
+    if not count: return os.path.getsize(path) == len(MAGIC)
+    with open(index_path, 'rb') as f:
+        f.seek((count - 1) * INDEX.size)
+        last, = INDEX.unpack(f.read(INDEX.size))
+    with open(path, 'rb') as f:
+        f.seek(last)
+        header = f.read(GAME.size)
+        if len(header) < GAME.size: return False
+        size, flags, plies = GAME.unpack(header)
+    return last + GAME.size + _codes_size(flags, plies) == os.path.getsize(path)
+
+def write_index(path, offsets):
+    with open(path + '.idx', 'wb') as f:
+        f.write(b''.join(INDEX.pack(offset) for offset in offsets))
+
+#------------------------------------------------------------------------------
+#  Writing
+#
+class GameWriter:
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as f:
+                f.write(MAGIC)
+            write_index(path, [])
+        elif not _index_matches(path, path + '.idx'):
+            offsets = scan_offsets(path)
+            end = len(MAGIC)
+            if offsets:
+                with open(path, 'rb') as f:
+                    f.seek(offsets[-1])
+                    size, flags, plies = GAME.unpack(f.read(GAME.size))
+                end = offsets[-1] + GAME.size + _codes_size(flags, plies)
+            os.truncate(path, end)    # drop a game an interruption cut short
+            write_index(path, offsets)
+        self.file = open(path, 'ab')
+        self.index = open(path + '.idx', 'ab')
+
+    #  Append a game: the moves played from the start, the winner, and
+    #  why it ended.  With reason 'illegal move' the last move may be the
+    #  illegal one; it is not stored.
+    def write(self, moves, winner, reason='no moves', size=8):
+        codes, encoded = encode_game(moves, size)
+        if encoded < len(moves) and not (reason == 'illegal move' and
+                                         encoded == len(moves) - 1):
+            raise ValueError("move %d, %r, is not legal" % (encoded, moves[encoded]))
+        offset = self.file.tell()
+        self.file.write(pack_game(size, winner, reason, codes))
+        self.file.flush()
+        self.index.write(INDEX.pack(offset))
+        self.index.flush()
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+#------------------------------------------------------------------------------
+#  Reading
+#
+class GameReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a Konane game record file" % path)
+        self.offsets = None
+
+    #  Offsets of every game, from the index when it is up to date
+    def _offsets(self):
+        if self.offsets is None:
+            index = self.path + '.idx'
+            if _index_matches(self.path, index):
+                with open(index, 'rb') as f:
+                    self.offsets = array.array('Q', f.read())
+                if sys.byteorder != 'little': self.offsets.byteswap()
+            else:
+                self.offsets = array.array('Q', scan_offsets(self.path))
+        return self.offsets
+
+    def __len__(self):
+        return len(self._offsets())
+
+    def _read(self, number):
+        header = self.file.read(GAME.size)
+        if len(header) < GAME.size: return None
+        size, flags, plies = GAME.unpack(header)
+        data = self.file.read(_codes_size(flags, plies))
+        if len(data) < _codes_size(flags, plies): return None
+        codes = array.array('H' if flags & WIDE else 'B', data)
+        if flags & WIDE and sys.byteorder != 'little': codes.byteswap()
+        return Game(number, size, 'o' if flags & 1 else 'x', REASONS[flags >> 2], codes)
+
+    #  Game number n (from 0)
+    def game(self, n):
+        self.file.seek(self._offsets()[n])
+        return self._read(n)
+
+    #  Yields the games from game 'start' on, reading as it goes
+    def games(self, start=0):
+        if start: self.file.seek(self._offsets()[start])
+        else: self.file.seek(len(MAGIC))
+        number = start
+        while 1:
+            game = self._read(number)
+            if game is None: return
+            yield game
+            number += 1
+
+    __iter__ = games
+
+    def close(self):
+        self.file.close()
+
+#------------------------------------------------------------------------------
+#  Round-trip test
+#
+#  Writes random games of several sizes, some ended by an illegal move,
+#  in two sessions of GameWriter, then a game with two-byte codes and
+#  half a game, as an interrupted writer would leave them.  After each
+#  step the index must match the file, and every game read back, by
+#  number and in sequence, must have the moves, winner, reason and size
+#  it was written with.
+#
+def _random_game(rng, size):
+    board, mover = U.populate_board(size), 'x'
+    moves = []
+    while 1:
+        succ = U.genmoves(board, mover)
+        if not succ:
+            return moves, OTHER[mover], 'no moves'
+        if len(moves) > 2 and rng.random() < 0.02:
+            moves.append((0, 0, 0, 0))
+            return moves, OTHER[mover], 'illegal move'
+        n = rng.choice(succ)
+        moves.append(n.move)
+        board, mover = n.b, OTHER[mover]
+
+def _check_file(path, written):
+    if not _index_matches(path, path + '.idx'):
+        raise AssertionError("the index does not match %s" % path)
+    with open(path + '.idx', 'rb') as f:
+        if list(array.array('Q', f.read())) != scan_offsets(path):
+            raise AssertionError("the index offsets are not the games'")
+    reader = GameReader(path)
+    try:
+        if len(reader) != len(written):
+            raise AssertionError("%d games read, %d written" % (len(reader), len(written)))
+        for n, game in enumerate(reader):
+            for got in (game, reader.game(n)):
+                moves, winner, reason, size, codes = written[n]
+                if reason == 'illegal move': moves = moves[:-1]
+                if (got.number, got.size, got.winner, got.reason) != (n, size, winner, reason):
+                    raise AssertionError("game %d reads back as %r" % (n, vars(got)))
+                if codes is not None and list(got.codes) != codes:
+                    raise AssertionError("game %d has codes %r" % (n, list(got.codes)))
+                if codes is None and list(got.moves()) != moves:
+                    raise AssertionError("game %d has moves %r" % (n, list(got.moves())))
+    finally:
+        reader.close()
+
+def selftest(games=60, seed=1):
+    rng = random.Random(seed)
+    written = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'games.rec')
+        for session in range(2):
+            writer = GameWriter(path)
+            for g in range(games // 2):
+                size = rng.choice((4, 6, 8, 10))
+                moves, winner, reason = _random_game(rng, size)
+                writer.write(moves, winner, reason, size)
+                written.append((moves, winner, reason, size, None))
+            writer.close()
+            _check_file(path, written)
+
+        # Codes above 255, written behind the index's back, which the
+        # next writer must find
+        codes = [300, 7, 1000]
+        with open(path, 'ab') as f:
+            f.write(pack_game(16, 'o', 'no moves', codes))
+        written.append(([], 'o', 'no moves', 16, codes))
+        GameWriter(path).close()
+        _check_file(path, written)
+
+        # An interrupted write: the next writer drops the partial game
+        with open(path, 'ab') as f:
+            f.write(pack_game(8, 'x', 'no moves', [0, 1, 2])[:-1])
+        writer = GameWriter(path)
+        moves, winner, reason = _random_game(rng, 8)
+        writer.write(moves, winner, reason, 8)
+        written.append((moves, winner, reason, 8, None))
+        writer.close()
+        _check_file(path, written)
+    print("konanerecord read back %d games as written" % len(written))
+
+#------------------------------------------------------------------------------
+#  Command line
+#
+def info_command(args):
+    reader = GameReader(args.file)
+    games = plies = 0
+    wins = {'x': 0, 'o': 0}
+    reasons = dict.fromkeys(REASONS, 0)
+    for game in reader:
+        games += 1
+        plies += game.plies
+        wins[game.winner] += 1
+        reasons[game.reason] += 1
+    reader.close()
+    print("%s: %d games, %d plies, %d bytes" % (args.file, games, plies,
+                                                 os.path.getsize(args.file)))
+    print("x won %d, o won %d; %s" % (wins['x'], wins['o'], ', '.join(
+        "%s %d" % (reason, n) for reason, n in reasons.items())))
+
+def show_command(args):
+    reader = GameReader(args.file)
+    numbers = args.games or range(len(reader))
+    for n in numbers:
+        game = reader.game(n)
+        names = [U.encode_move(*move, size=game.size) for move in game.moves()]
+        print("game %d: %dx%d, %s won (%s), %d plies" %
+              (n, game.size, game.size, game.winner, game.reason, game.plies))
+        print('  ' + ', '.join(names))
+    reader.close()
+
+def convert_command(args):
+    writer = GameWriter(args.out)
+    count = 0
+    for path in args.matches:
+        with open(path) as f:
+            for line in f:
+                result = json.loads(line)
+                size = result.get('size', 8)
+                writer.write(result['moves'], result['winner'], result['reason'], size)
+                count += 1
+    writer.close()
+    print("wrote %d games to %s" % (count, args.out))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Konane game records.")
+    sub = ap.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('info')
+    p.add_argument('file')
+    p.set_defaults(func=info_command)
+    p = sub.add_parser('show')
+    p.add_argument('file')
+    p.add_argument('games', nargs='*', type=int)
+    p.set_defaults(func=show_command)
+    p = sub.add_parser('convert')
+    p.add_argument('matches', nargs='+', help="konanematch result files")
+    p.add_argument('--out', required=True)
+    p.set_defaults(func=convert_command)
+    p = sub.add_parser('selftest', help="check that games read back as written")
+    p.set_defaults(func=lambda args: selftest())
+    args = ap.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
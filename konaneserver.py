@@ -0,0 +1,358 @@
+#!/bin/env python3
+#
+# Konane engine server.
+#
+# Usage: ./konaneserver.py [--socket PATH] [--workers N]
+#
+#  A long-running process that plays moves for any number of games at
+#  once.  It talks on stdin/stdout, or with --socket on a Unix socket
+#  that many clients can connect to.  Searches run in a pool of worker
+#  processes; each game stays on one worker, and each worker keeps the
+#  player objects it has made, one per (player, colour, board size), so
+#  their transposition tables, move ordering history, opening book and
+#  endgame table stay warm from move to move and from game to game.
+#
+#  Requests and replies are JSON objects, one per line.  A request may
+#  carry an "id", which its reply repeats, and names the game it is about
+#  with "game" (any string; each connection has its own games).
+#
+#     {"cmd": "position", "game": G, "player": "dts:time_limit=0.5",
+#      "board": ["xoxoxoxo", ...], "mover": "x"}
+#     {"cmd": "position", "game": G, "player": "sps", "size": 8,
+#      "moves": [[5, 3, 3, 3], ...]}
+#            set the game's position: the board (rows as strings) and
+#            the side to move, or the moves played from the start.  A
+#            board's 'x's must be where row + column is even and its
+#            'o's where it is odd, as at the start.  The player is given
+#            as in konanematch and defaults to the game's last one.
+#            Reply {"ok": true}.
+#
+#     {"cmd": "go", "game": G, "time": 1.0}     (or "depth": 6)
+#            search the position and reply {"move": [r, c, r, c],
+#            "name": "5d 3d", "depth", "nodes", "seconds"}; "move" is
+#            null when the side to move has none.  Without either limit
+#            the player's own is used.  Replies to go come when the
+#            search ends, so other requests can be answered meanwhile.
+#
+#     {"cmd": "stop", "game": G}
+#            end the game's search now; its go replies with the best
+#            move found so far
+#
+#     {"cmd": "stats"}             the server's counters
+#     {"cmd": "stats", "game": G}  the game's last search
+#
+#     {"cmd": "quit"}              close the connection
+#
+#  A request that cannot be carried out gets {"error": "..."}.
+#
+#  konaneclient.py is a player module that gets its moves from this
+#  server, so konaneman and konaneself can use it.
+#
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import konaneevents as EV
+import konaneutils as U
+import konanematch as M
+
+#------------------------------------------------------------------------------
+#  Worker processes
+#
+#  _engines maps (player spec, colour, size) to [Konane object, its own
+#  time_limit, its own max_depth].  A search copies the position into the
+#  object's board, the way the drivers change the board it was given.
+#
+_engines = {}
+
+#  Run once in each worker when the server starts, so the first game
+#  does not pay for imports and tables
+def _warm():
+    import dts
+    EV.headless()
+    U.jump_table(8)
+    return os.getpid()
+
+def _search(spec, who, rows, limits, stop):
+    board = [list(row) for row in rows]
+    key = (spec, who, len(board))
+    engine = _engines.get(key)
+    warm = engine is not None
+    if not warm:
+        name, kwargs = M.parse_player(spec)
+        K = __import__(name).Konane(board, who, **kwargs)
+        engine = _engines[key] = [K, getattr(K, 'time_limit', None),
+                                  getattr(K, 'max_depth', None)]
+    K, timeLimit, maxDepth = engine
+    K.board[:] = board
+    if hasattr(K, 'deepen'):
+        K.time_limit = limits.get('time', float('inf') if 'depth' in limits else timeLimit)
+        K.max_depth = limits.get('depth', maxDepth)
+    elif 'time' in limits and hasattr(K, 'time_limit'):
+        K.time_limit = limits['time']
+    K.stop = stop
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            move = K.move()
+    finally:
+        K.stop = None
+        EV.flush()
+    return {'move': list(move), 'depth': getattr(K, 'depth', None),
+            'nodes': getattr(K, 'nodes', None),
+            'seconds': time.perf_counter() - start, 'warm': warm,
+            'engines': len(_engines)}
+
+#------------------------------------------------------------------------------
+#  Server
+#
+class ProtocolError(Exception):
+    pass
+
+class Game:
+    def __init__(self, worker):
+        self.worker = worker
+        self.player = None
+        self.rows = None
+        self.mover = None
+        self.stop = None
+        self.search = None
+        self.last = None
+
+class Server:
+    def __init__(self, workers):
+        ctx = multiprocessing.get_context()
+        self.manager = ctx.Manager()
+        self.pools = [concurrent.futures.ProcessPoolExecutor(1, mp_context=ctx)
+                      for i in range(workers)]
+        self.pids = [pool.submit(_warm).result() for pool in self.pools]
+        self.games = [0] * workers
+        self.searches = [0] * workers
+        self.engines = [0] * workers
+        self.running = 0
+        self.connections = 0
+        self.start = time.time()
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+    #  One connection: requests are read in order, and each go runs as
+    #  its own task so that stop and stats are answered while it searches.
+    async def serve(self, reader, writer):
+        self.connections += 1
+        games = {}
+        tasks = set()
+        try:
+            while 1:
+                line = await reader.readline()
+                if not line: break
+                if not line.strip(): continue
+                request = {}
+                try:
+                    parsed = json.loads(line)
+                    if not isinstance(parsed, dict):
+                        raise ProtocolError("a request is a JSON object")
+                    request = parsed
+                    if request.get('cmd') == 'quit': break
+                    if request.get('cmd') == 'go':
+                        task = asyncio.ensure_future(self.go(games, request, writer))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                        continue
+                    reply = self.command(games, request)
+                except (ValueError, ProtocolError) as e:
+                    reply = {'error': str(e)}
+                await self.reply(writer, request, reply)
+        finally:
+            for game in games.values():
+                if game.stop is not None: game.stop.set()
+            if tasks: await asyncio.wait(tasks)
+            for game in games.values():
+                self.games[game.worker] -= 1
+            self.connections -= 1
+
+    async def reply(self, writer, request, reply):
+        if 'id' in request: reply['id'] = request['id']
+        if 'game' in request: reply.setdefault('game', request['game'])
+        writer.write((json.dumps(reply) + '\n').encode())
+        await writer.drain()
+
+    def game(self, games, request, create=False):
+        name = request.get('game')
+        if not isinstance(name, str):
+            raise ProtocolError("no game named")
+        game = games.get(name)
+        if game is None:
+            if not create:
+                raise ProtocolError("no position for game %r" % name)
+            # New games go to the worker with the fewest
+            worker = min(range(len(self.pools)), key=lambda w: self.games[w])
+            self.games[worker] += 1
+            game = games[name] = Game(worker)
+        return game
+
+    def command(self, games, request):
+        cmd = request.get('cmd')
+        if cmd == 'position':
+            return self.position(self.game(games, request, create=True), request)
+        if cmd == 'stop':
+            game = self.game(games, request)
+            if game.search: game.stop.set()
+            return {'ok': True, 'searching': game.search is not None}
+        if cmd == 'stats':
+            if 'game' in request:
+                game = self.game(games, request)
+                return {'player': game.player, 'worker': game.worker,
+                        'searching': game.search is not None, 'last': game.last}
+            return self.stats()
+        raise ProtocolError("unknown command %r" % cmd)
+
+    def position(self, game, request):
+        if game.search:
+            raise ProtocolError("game is searching")
+        player = request.get('player', game.player)
+        if not isinstance(player, str):
+            raise ProtocolError("no player given")
+        if 'moves' in request:
+            size = request.get('size', 8)
+            if not (isinstance(size, int) and 4 <= size <= len(U.COLUMNS) and size % 2 == 0):
+                raise ProtocolError("size must be even, from 4 to %d" % len(U.COLUMNS))
+            board = U.populate_board(size)
+            mover = 'x'
+            for move in request['moves']:
+                move = tuple(move) if isinstance(move, list) else None
+                if move not in set(U.jumps(board, mover)):
+                    raise ProtocolError("illegal move %r" % (move,))
+                board = U.make_jump(board, mover, move).b
+                mover = {'x': 'o', 'o': 'x'}[mover]
+            rows = [''.join(row) for row in board]
+        else:
+            rows = request.get('board')
+            mover = request.get('mover')
+            if not (isinstance(rows, list) and 4 <= len(rows) <= len(U.COLUMNS) and
+                    len(rows) % 2 == 0 and
+                    all(isinstance(row, str) and len(row) == len(rows) and
+                        not row.strip('xo ') for row in rows)):
+                raise ProtocolError("board must be an even number, from 4 to %d, of rows "
+                                    "of 'x', 'o' and ' ', as many as the board is wide"
+                                    % len(U.COLUMNS))
+            # Pieces never change colour of square, and the move
+            # generators count on that
+            for i, row in enumerate(rows):
+                for j, square in enumerate(row):
+                    if square != ' ' and square != 'xo'[(i + j) % 2]:
+                        raise ProtocolError("%r on row %d column %d, where only %r can be"
+                                            % (square, i, j, 'xo'[(i + j) % 2]))
+            if mover not in ('x', 'o'):
+                raise ProtocolError("mover must be 'x' or 'o'")
+        game.player, game.rows, game.mover = player, rows, mover
+        return {'ok': True}
+
+    async def go(self, games, request, writer):
+        try:
+            game = self.game(games, request)
+            if game.search:
+                raise ProtocolError("game is already searching")
+            limits = {}
+            for name, kind in (('time', (int, float)), ('depth', int)):
+                if name in request:
+                    if not isinstance(request[name], kind) or request[name] <= 0:
+                        raise ProtocolError("%s must be a positive number" % name)
+                    limits[name] = request[name]
+            board = [list(row) for row in game.rows]
+            if U.gameDone(board, game.mover):
+                reply = {'move': None}
+            else:
+                if game.stop is None:
+                    game.stop = self.manager.Event()
+                game.stop.clear()
+                loop = asyncio.get_running_loop()
+                game.search = loop.run_in_executor(
+                    self.pools[game.worker], _search, game.player, game.mover,
+                    game.rows, limits, game.stop)
+                self.running += 1
+                try:
+                    result = await game.search
+                finally:
+                    game.search = None
+                    self.running -= 1
+                self.searches[game.worker] += 1
+                self.engines[game.worker] = result.pop('engines')
+                move = result['move']
+                result['name'] = U.encode_move(*move, size=len(board))
+                game.last = result
+                reply = dict(result)
+        except ProtocolError as e:
+            reply = {'error': str(e)}
+        except Exception as e:
+            # The player failed: a bad module name or arguments, or a crash
+            reply = {'error': "%s: %s" % (type(e).__name__, e)}
+        await self.reply(writer, request, reply)
+
+    def stats(self):
+        return {'uptime': time.time() - self.start,
+                'connections': self.connections,
+                'games': sum(self.games),
+                'searches': sum(self.searches),
+                'running': self.running,
+                'workers': [{'pid': pid, 'games': g, 'searches': s, 'engines': e}
+                            for pid, g, s, e in zip(self.pids, self.games,
+                                                    self.searches, self.engines)]}
+
+#------------------------------------------------------------------------------
+#  Transports
+#
+class _StdoutWriter:
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    async def drain(self):
+        pass
+
+async def serve_stdio(server):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    await server.serve(reader, _StdoutWriter())
+
+async def serve_socket(server, path):
+    if os.path.exists(path): os.unlink(path)
+
+    async def connection(reader, writer):
+        try:
+            await server.serve(reader, writer)
+        finally:
+            writer.close()
+
+    listener = await asyncio.start_unix_server(connection, path)
+    print("listening on", path, file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Konane engine server.")
+    ap.add_argument('--socket', help="Unix socket to listen on (default: stdin/stdout)")
+    ap.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    args = ap.parse_args(argv)
+    server = Server(args.workers)
+    try:
+        if args.socket:
+            asyncio.run(serve_socket(server, args.socket))
+        else:
+            asyncio.run(serve_stdio(server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# Lazy SMP: parallel search for the dts player
+#
+#-------------------------------------------------------------------------
+# Several worker processes run the ordinary iterative-deepening search
+# on the same root at the same time.  They share nothing but one
+# SharedTranspositionTable, so whatever one worker learns about a
+# position the others find in the table.  To keep them from all walking
+# the same tree in lockstep:
+#
+#    odd-numbered workers skip the first iteration, so they run one
+#    ply deeper than their neighbours
+#
+#    every worker but the first shuffles the root moves before its first
+#    iteration, so they start down different lines
+#
+# The first worker to finish its search (budget spent, max_depth reached
+# or game solved) stops the others.  The deepest completed iteration
+# wins; among equally deep ones, the lowest-numbered worker.
+#
+# search: run one parallel search for a Konane player
+#
+# Run 'python konanesmp.py [workers] [depth]' for a scaling report:
+# nodes per second and time to reach a fixed depth with 1, 2, 4 ...
+# workers over a few middlegame positions.
+#
+#------------------------------------------------------------------------------
+#
+import multiprocessing
+import random
+import sys
+import time
+import konanebits as U
+import konanett as T
+import konaneevents as EV
+
+def _worker(cls, board, who, settings, ttname, ttbits, i, stop, results):
+    K = cls(board, who, **settings)
+    K.tt = T.SharedTranspositionTable(ttbits, name=ttname, size=len(board))
+    K.stop = stop
+    K.startDepth = i % 2
+    K.seed = i if i else None
+    pos = U.Position(board)
+    EV.headless()
+    scored = K.deepen(pos, pos.moves(who))
+    stop.set()
+    EV.flush()
+    results.put((i, K.depth, scored, K.nodes, K.tt.stats()))
+    K.tt.close()
+
+#  Returns (scored, depth, nodes, reports) where scored is the deepest
+#  worker's [(score, move), ...] list (best first), depth its completed
+#  depth, nodes the total over all workers, and reports one
+#  (worker, depth, nodes, tt stats) tuple per worker.
+#
+#  A daemonic process (a konanematch pool worker) may not start processes
+#  of its own, so there the player searches alone, on the same table.
+#  If the workers cannot be started or the search fails, the ones
+#  running are stopped and the table's shared memory is freed before the
+#  error is passed on.
+#
+def search(player, workers):
+    if multiprocessing.current_process().daemon:
+        pos = U.Position(player.board)
+        scored = player.deepen(pos, pos.moves(player.who))
+        return scored, player.depth, player.nodes, \
+               [(0, player.depth, player.nodes, player.tt.stats())]
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    results = ctx.Queue()
+    # The workers' tables take the new generation when they attach
+    player.tt.new_search()
+    # Built as the player was, with its limits as they are now
+    settings = dict(player.settings, time_limit=player.time_limit,
+                    node_limit=player.node_limit, max_depth=player.max_depth)
+    procs = [ctx.Process(target=_worker,
+                         args=(type(player), player.board, player.who, settings,
+                               player.tt.name, player.tt.bits, i, stop, results))
+             for i in range(workers)]
+    try:
+        for p in procs: p.start()
+        done = [results.get() for p in procs]
+    except BaseException:
+        stop.set()
+        for p in procs:
+            if p.pid is not None:
+                p.terminate()
+                p.join()
+        player.tt.close()
+        raise
+    for p in procs: p.join()
+
+    done.sort(key=lambda r: (-r[1], r[0]))
+    i, depth, scored, nodes, stats = done[0]
+    reports = [(r[0], r[1], r[3], r[4]) for r in sorted(done)]
+    return scored, depth, sum(r[3] for r in done), reports
+
+#------------------------------------------------------------------------------
+#  Scaling report
+#
+def _positions(count=4, plies=8, seed=7):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        b = U.populate_board()
+        mover = 'x'
+        for i in range(plies):
+            succ = U.genmoves(b, mover)
+            if not succ: break
+            b = rng.choice(succ).b
+            mover = U.OTHER[mover]
+        else:
+            positions.append((b, mover))
+    return positions
+
+def scaling(maxworkers, depth):
+    import dts
+    positions = _positions()
+    base = None
+    print("workers  time-to-depth  speedup  nodes/sec  nps-scaling")
+    n = 1
+    while n <= maxworkers:
+        elapsed = nodes = 0
+        for b, mover in positions:
+            K = dts.Konane(b, mover, time_limit=1e9, max_depth=depth)
+            K.tt = T.SharedTranspositionTable()
+            start = time.time()
+            scored, d, count, reports = search(K, n)
+            elapsed += time.time() - start
+            nodes += count
+            K.tt.close()
+        if base is None: base = (elapsed, nodes / elapsed)
+        print("%7d  %13.2f  %7.2f  %9.0f  %11.2f" % (n, elapsed, base[0] / elapsed,
+              nodes / elapsed, nodes / elapsed / base[1]))
+        n *= 2
+
+if __name__ == '__main__':
+    scaling(int(sys.argv[1]) if len(sys.argv) > 1 else multiprocessing.cpu_count(),
+            int(sys.argv[2]) if len(sys.argv) > 2 else 7)
@@ -0,0 +1,90 @@
+# Search statistics for Konane players
+#
+#-------------------------------------------------------------------------
+# A SearchStats object records what one move's search did.  A player
+# creates a fresh one per move when statistics are turned on and leaves
+# it in its 'stats' attribute; with statistics off the player keeps None
+# there and the search skips every call below.
+#
+# Recorded:
+#    nodes[ply]          nodes visited at each ply below the root
+#    leaves              leaf evaluations
+#    egtbHits            positions answered by the endgame database
+#    cutoffs[ply]        beta cutoffs at each ply
+#    cutoffMoves[n]      cutoffs caused by the n-th move searched (from 0)
+#    iterations          (depth, nodes, seconds) per completed iteration
+#    genTime, evalTime   seconds spent generating/ordering moves and
+#                        evaluating leaves
+#    ttHits, ttProbes    transposition table use during this search
+#
+# as_dict() gives all of it, plus the derived numbers (effective
+# branching factor, hit rate, time split), as plain data for logging.
+#
+#------------------------------------------------------------------------------
+#
+import time
+
+MAX_PLY = 128
+
+class SearchStats:
+    def __init__(self):
+        self.nodes = [0] * MAX_PLY
+        self.cutoffs = [0] * MAX_PLY
+        self.cutoffMoves = {}
+        self.leaves = 0
+        self.egtbHits = 0
+        self.iterations = []
+        self.genTime = 0.0
+        self.evalTime = 0.0
+        self.ttHits = 0
+        self.ttProbes = 0
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+
+    def cutoff(self, ply, n):
+        self.cutoffs[ply] += 1
+        self.cutoffMoves[n] = self.cutoffMoves.get(n, 0) + 1
+
+    def iteration(self, depth, nodes):
+        self.iterations.append((depth, nodes, time.perf_counter() - self.start))
+
+    #  tt is the player's table; its counters are compared with 'before',
+    #  a copy of tt.stats() taken when the search started.
+    def finish(self, tt=None, before=None):
+        self.seconds = time.perf_counter() - self.start
+        if tt is not None:
+            after = tt.stats()
+            self.ttHits = after['hits'] - before['hits']
+            self.ttProbes = self.ttHits + after['misses'] - before['misses']
+
+    #  Nodes of the last iteration over nodes of the one before it
+    def branching_factor(self):
+        its = self.iterations
+        if len(its) < 2: return 0.0
+        last = its[-1][1] - its[-2][1]
+        prev = its[-2][1] - (its[-3][1] if len(its) > 2 else 0)
+        return last / prev if prev else 0.0
+
+    def as_dict(self):
+        used = len(self.nodes)
+        while used and not self.nodes[used-1]: used -= 1
+        total = sum(self.nodes)
+        cutoffs = sum(self.cutoffs)
+        return {
+            'nodes': total,
+            'nodes_per_ply': self.nodes[:used],
+            'leaves': self.leaves,
+            'egtb_hits': self.egtbHits,
+            'cutoffs': cutoffs,
+            'cutoffs_per_ply': self.cutoffs[:used],
+            'cutoffs_by_move_index': dict(sorted(self.cutoffMoves.items())),
+            'first_move_cutoff_rate': self.cutoffMoves.get(0, 0) / cutoffs if cutoffs else 0.0,
+            'iterations': self.iterations,
+            'branching_factor': self.branching_factor(),
+            'tt_hit_rate': self.ttHits / self.ttProbes if self.ttProbes else None,
+            'seconds': self.seconds,
+            'gen_seconds': self.genTime,
+            'eval_seconds': self.evalTime,
+            'other_seconds': self.seconds - self.genTime - self.evalTime,
+            'nodes_per_second': total / self.seconds if self.seconds else 0.0,
+        }
@@ -0,0 +1,221 @@
+# Transposition table for Konane search
+#
+#-------------------------------------------------------------------------
+# Different jump orders often reach the same board, so the search keeps
+# what it learned about each position in a fixed-size hash table keyed
+# by Position.key(mover).
+#
+# Each entry holds:
+#    key     the full 64-bit key, to tell positions sharing a bucket apart
+#    depth   how many plies were searched below the position
+#    flag    EXACT, LOWER (score is a lower bound) or UPPER (upper bound)
+#    score   the search result
+#    move    the best move found, tried first when the position recurs
+#    age     the search (generation) that last stored or found it
+#
+# The table has 2**bits buckets of two slots.  Slot 0 is depth-preferred:
+# it is only overwritten by an entry searched at least as deep, by the
+# same position, or by anything once its entry is from an earlier
+# search.  Slot 1 is always-replace and takes everything else.
+#
+# The table is kept from move to move (and from game to game in the
+# server), so new_search() starts a new generation at every search;
+# otherwise slot 0 would fill up with deep entries for positions that
+# can no longer occur.
+#
+# Counters:
+#    hits        probes that found the position
+#    misses      probes that did not
+#    collisions  misses where the bucket was full of other positions
+#    stores      entries written
+#
+# SharedTranspositionTable has the same interface, but lives in a
+# multiprocessing.shared_memory block so that several search processes
+# can share it (see konanesmp).  The counters are per process.
+#
+#------------------------------------------------------------------------------
+#
+import weakref
+from multiprocessing import shared_memory
+import konanebits as U
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+class TranspositionTable:
+    def __init__(self, bits=16):
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        n = 2 * self.size
+        self.generation = 0
+        self.ages = [0] * n
+        self.keys = [0] * n
+        self.depths = [-1] * n
+        self.flags = [0] * n
+        self.scores = [0] * n
+        self.moves = [None] * n
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    #  Returns (depth, flag, score, move) for the position, or None.  An
+    #  entry found is the current search's to keep.
+    #
+    def probe(self, key):
+        i = (key & self.mask) << 1
+        keys = self.keys
+        if keys[i] != key:
+            i += 1
+            if keys[i] != key:
+                self.misses += 1
+                if keys[i] or keys[i-1]:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        self.ages[i] = self.generation
+        return (self.depths[i], self.flags[i], self.scores[i], self.moves[i])
+
+    def store(self, key, depth, flag, score, move):
+        i = (key & self.mask) << 1
+        if not (self.keys[i] == key or depth >= self.depths[i] or
+                self.ages[i] != self.generation):
+            i += 1
+        self.ages[i] = self.generation
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.scores[i] = score
+        self.moves[i] = move
+        self.stores += 1
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'collisions': self.collisions, 'stores': self.stores,
+                'hit_rate': self.hits / probes if probes else 0.0}
+
+
+#------------------------------------------------------------------------------
+#  Transposition table in shared memory.
+#
+#  Every slot is two 64-bit words: the entry packed into one word 'data',
+#  and 'check' = key ^ data.  Writers store both words without locking;
+#  if two processes write the same slot at once, or a reader sees half a
+#  write, check ^ data no longer equals the key and the slot just reads
+#  as a miss.
+#
+#  data layout, from the low bits up:
+#     score + 2**27   28 bits  (search scores stay within +/- WIN + 1)
+#     depth           8 bits
+#     flag            2 bits
+#     from square     11 bits  (NOMOVE when there is no move)
+#     to square       11 bits
+#     age             4 bits   (the generation, modulo 16)
+#
+#  Moves are rebuilt from their two squares with the jump table of the
+#  board size given to the constructor.  Eleven bits are enough for any
+#  board up to 44x44.
+#
+#  The process that creates the table owns the memory and frees it when
+#  the table is garbage collected or closed; others attach by name.  The
+#  generation is kept in one more word after the buckets: the owner's
+#  new_search() advances it before the workers start, and a table that
+#  attaches takes the generation it finds.
+#
+NOMOVE = 0x7ff
+SCORE_BIAS = 1 << 27
+AGES = 0xf
+
+def _release(shm, words, owner):
+    words.release()
+    shm.close()
+    if owner: shm.unlink()
+
+class SharedTranspositionTable:
+    def __init__(self, bits=16, name=None, size=U.SIZE):
+        self.bits = bits
+        self.jumps = U.geometry(size).jumps
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        owner = name is None
+        if owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.size * 32 + 8)
+            self.shm.buf[:self.size * 32 + 8] = bytes(self.size * 32 + 8)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.owner = owner
+        self.words = self.shm.buf.cast('Q')
+        self.generation = self.words[self.size * 4]
+        self._finalizer = weakref.finalize(self, _release, self.shm, self.words, owner)
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def close(self):
+        self._finalizer()
+
+    def clear(self):
+        self.shm.buf[:self.size * 32 + 8] = bytes(self.size * 32 + 8)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self):
+        if self.owner:
+            self.words[self.size * 4] = (self.generation + 1) & AGES
+        self.generation = self.words[self.size * 4]
+
+    def probe(self, key):
+        words = self.words
+        i = (key & self.mask) << 2
+        data = words[i+1]
+        if words[i] ^ data != key:
+            i += 2
+            data = words[i+1]
+            if words[i] ^ data != key:
+                self.misses += 1
+                if words[i] or words[i-2]:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        if data >> 60 != self.generation:
+            data = data & ~(AGES << 60) | self.generation << 60
+            words[i] = key ^ data
+            words[i+1] = data
+        frm = (data >> 38) & NOMOVE
+        move = None if frm == NOMOVE else self.jumps[(frm, (data >> 49) & NOMOVE)]
+        return ((data >> 28) & 0xff, (data >> 36) & 3,
+                (data & 0xfffffff) - SCORE_BIAS, move)
+
+    def store(self, key, depth, flag, score, move):
+        words = self.words
+        i = (key & self.mask) << 2
+        data = words[i+1]
+        if not (words[i] ^ data == key or depth >= (data >> 28) & 0xff or
+                data >> 60 != self.generation):
+            i += 2
+        if move is None:
+            frm = to = NOMOVE
+        else:
+            frm, to = move[0], move[1]
+        data = (score + SCORE_BIAS) | min(depth, 255) << 28 | flag << 36 | \
+               frm << 38 | to << 49 | self.generation << 60
+        words[i] = key ^ data
+        words[i+1] = data
+        self.stores += 1
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'collisions': self.collisions, 'stores': self.stores,
+                'hit_rate': self.hits / probes if probes else 0.0}
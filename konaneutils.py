@@ -6,9 +6,13 @@
 #    the mover who produced that board ('x' or 'o')
 #    the move that produced in that board (a four-number tuple)
 #
-# There is no need to keep structural tree information (pointers to 
+# There is no need to keep structural tree information (pointers to
 # parent, children) because the Minimax algorithm generates and
-# explores nodes as it traverses the tree. 
+# explores nodes as it traverses the tree.
+#
+# This module holds the rules of the game.  The drivers (konaneman,
+# konaneself, konanematch) and the players all use these routines, so
+# there is one definition of a legal move.
 #
 #------------------------------------------------------------------------------
 #
@@ -16,33 +20,91 @@
 #
 # print_board:  Prints the board to stdout
 #
+# jumps: from a board and a player, generate that player's moves one at
+#        a time as (from_row, from_col, to_row, to_col) tuples, without
+#        building any boards
+#
+# make_jump: from a board, a player and one of the moves jumps produced,
+#        make the new board, encapsulated in a new node
+#
 # genmove: from a board and a player,
 #          produce list of Node objects with all possible moves
 #
 # gameDone: from a board and a player, return True if there are no moves
 #           for that player
 #
+# count_moves: from a board and a player, the number of moves genmoves
+#           would produce, without building any successor boards
+#
 # moveable: from an x,y position and a board, True if there is at least
 #           one available move from that position.
 #
 # make_succ: from a board and the x,y starting and ending points, make
 #           a new board, encapsulated in a new node.
 #
+# make_move: the drivers' version of make_succ: check a move and make it
+#           on the board itself, marking what changed for print_board
+#
+# cleanup_move: remove the marks make_move left
+#
 #------------------------------------------------------------------------------
 # Functions that don't reference the current game board.
 #
+# populate_board: the starting board
+#
+# encode_move: a move as the two square names a player types ('3d 3f')
+#
+# square_name: one square's name ('3d')
+#
 # each_players_places: produce two lists, one for each player, of the
 #           board positions that belong to that player
 #
+# jump_table: for each square, the geometry of every jump that could
+#           start there (destination and jumped-over square of each
+#           hop, direction by direction); built once per board size
+#
+# jump_paths: for each such jump, the squares jumped over and the
+#           squares landed on, by (from_row, from_col, to_row, to_col)
+#
 # jumppath: from a proposed x,y starting position to an x,y ending
 #           position, return the squares that are landed on and the
 #           squares that are jumped over.
 #
 # dests_from: from an x,y starting position, all possible jump destinations
 #
+# board_places: each_players_places for the size of a given board, kept
+#           once per size
+#
 #------------------------------------------------------------------------------
+# Boards are square lists of lists of any even size; 8x8 is the standard
+# game.  Functions given a board take the size from it.
+#
+# For searches that make many boards there is also a flat form: the
+# board as size*size bytes, row by row, and each move packed into one
+# integer (see "Flat boards and packed moves" below):
+#
+# flatten, unflatten: convert a list-of-lists board to and from the
+#           flat form
 #
+# pack_move, unpack_move: convert a four-number move to and from its
+#           integer
+#
+# flat_jumps, flat_make, flat_count, flat_done: jumps, make_jump,
+#           count_moves and gameDone on flat boards and packed moves
+#
+# move_array: a position's packed moves as an array
+#
+#------------------------------------------------------------------------------
+#
+import array
+import math
+
+COLUMNS = 'abcdefghijklmnopqrstuvwxyz'
+
+#  Slots rather than a __dict__: genmoves makes one Node per move
 class Node:
+    __slots__ = ('b', 'mover', 'move')
+
     def __init__(self, b, mover, move):
         self.b = b
         self.mover = mover
@@ -52,45 +114,115 @@ class Node:
 #  A simple function to print the board
 #
 def print_board(b):
-    print('  a b c d e f g h')
-    
+    width = len(str(len(b) - 1))
+    print(' ' * width + ' ' + ' '.join(COLUMNS[:len(b)]))
+
     for i in range(len(b)):
         r = ' '.join(b[i])
-        print(str(i) + ' ' + r)
+        print(str(i).rjust(width) + ' ' + r)
+
+#------------------------------------------------------------------------------
+#  Populate the board, size x size (size even), and empty the two middle
+#  squares of row size/2 - 1 (3d and 3e on the standard 8x8 board)
+#
+def populate_board(size=8):
+    board = [[('x', 'o')[(i + j) % 2] for j in range(size)] for i in range(size)]
+    half = size // 2
+    board[half-1][half-1] = ' '
+    board[half-1][half] = ' '
+    return board
+
+#------------------------------------------------------------------------------
+#  Encode a move (four numbers) into two board positions
+#  A square off the board is shown by its numbers, '(3,9)', so that an
+#  illegal move from a player can still be printed.
+#
+def encode_move(from_row, from_col, to_row, to_col, size=8):
+    return square_name(from_row, from_col, size) + ' ' + \
+           square_name(to_row, to_col, size)
+
+def square_name(row, col, size=8):
+    if 0 <= row < size and 0 <= col < size:
+        return str(row) + COLUMNS[col]
+    return '(%d,%d)' % (row, col)
 
 #------------------------------------------------------------------------------
 #  gameDone command
 #  It will check whether the game is finished for a particular mover and board
 #  Returns boolean True if the game is over
 #
+#  Stops at the first move jumps finds.
+#
 def gameDone(b, mover):
-    global places
-    for from_row, from_col in places[mover]:
-        if moveable(from_row, from_col, b):
-            return None
+    for move in jumps(b, mover):
+        return None
     return True
 
+#------------------------------------------------------------------------------
+#  Generate the possible moves, one at a time
+#  Yields (from_row, from_col, to_row, to_col) tuples.  Nothing is built
+#  for a move until the caller asks for it, so a caller that stops early
+#  (gameDone after one move, a search after a cutoff) pays only for the
+#  moves it took; successor boards are made with make_jump, and only for
+#  the moves actually searched.
+#
+#  Each piece's jumps come shortest first: a single jump needs two
+#  squares looked at, and a k-hop jump is only tried once the (k-1)-hop
+#  jump is known to be legal.  The squares to look at come from
+#  jump_table.
+#
+def jumps(b, mover):
+    table = jump_table(len(b))
+    for from_row, from_col in board_places(b)[mover]:
+        if b[from_row][from_col] == ' ': continue
+        for ray in table[from_row][from_col]:
+            for to_row, to_col, over_row, over_col in ray:
+                if b[over_row][over_col] == ' ' or not b[to_row][to_col] == ' ':
+                    break
+                yield (from_row, from_col, to_row, to_col)
+
+#------------------------------------------------------------------------------
+#  Make the successor node for a move from jumps
+#  The move is known to be legal, so unlike make_succ nothing is checked.
+#  Copies only the rows the jump touches.
+#
+def make_jump(b, mover, move):
+    from_row, from_col, to_row, to_col = move
+    jump_over, jump_land = jump_paths(len(b))[move]
+    newb = b[:]
+    for i in range(min(from_row, to_row), max(from_row, to_row) + 1):
+        newb[i] = b[i][:]
+    for i,j in jump_over:
+        newb[i][j] = ' '
+    newb[from_row][from_col] = ' '
+    newb[to_row][to_col] = mover
+    return Node(newb, mover, move)
+
 #------------------------------------------------------------------------------
 #  Generate all possible moves
 #  Returns list of Nodes of successor moves.
 #
 def genmoves(b, mover):
-    global places   # Assuming you put this in a global variable
-    successors = []
+    return [make_jump(b, mover, move) for move in jumps(b, mover)]
 
-    # For each places that mover can be
-    for from_row, from_col in places[mover]:
-        if not moveable(from_row, from_col, b): continue
-        
-        # generate all the destinations the mover can jump to 
-        dests = dests_from(from_row, from_col)
-
-        # And make a successor node for valid move
-        for to_row, to_col in dests:
-            succ = make_succ(b, mover, from_row, from_col, to_row, to_col)
-            if succ:
-                successors.append(succ)
-    return successors
+#------------------------------------------------------------------------------
+#  Count the possible moves
+#  Returns the number of Nodes genmoves would return, for scoring
+#  functions that only need len(genmoves(b, mover)).
+#
+#  The same walk as jumps, counting instead of yielding.
+#
+def count_moves(b, mover):
+    table = jump_table(len(b))
+    count = 0
+    for from_row, from_col in board_places(b)[mover]:
+        if b[from_row][from_col] == ' ': continue
+        for ray in table[from_row][from_col]:
+            for to_row, to_col, over_row, over_col in ray:
+                if b[over_row][over_col] == ' ' or not b[to_row][to_col] == ' ':
+                    break
+                count += 1
+    return count
 
 #------------------------------------------------------------------------------
 #  List of all possible board positions for each player
@@ -102,22 +234,85 @@ def genmoves(b, mover):
 #  Call this once at the beginning of your program.
 #  (So you don't call it repeatedly every time you want to move)
 #
-def each_players_places():
+#  With a size, the squares of a size x size board; the global is only
+#  set for the standard 8x8 board.
+#
+def each_players_places(size=8):
     global places
-    places = {'x':[], 'o':[]}
-    for i in range(8):
-        for j in range(0,8,2):
+    found = {'x':[], 'o':[]}
+    for i in range(size):
+        for j in range(0,size,2):
             if i%2 == 0:
-                places['x'].append((i, j))
-                places['o'].append((i, j+1))
+                found['x'].append((i, j))
+                found['o'].append((i, j+1))
             else:
-                places['o'].append((i, j))
-                places['x'].append((i, j+1))
-    return places
+                found['o'].append((i, j))
+                found['x'].append((i, j+1))
+    if size == 8:
+        places = found
+    return found
 
 # Populate the global variable
 places = each_players_places()
 
+_places = {8: places}
+
+def board_places(b):
+    found = _places.get(len(b))
+    if found is None:
+        found = _places[len(b)] = each_players_places(len(b))
+    return found
+
+#------------------------------------------------------------------------------
+#  Jump geometry, precomputed per board size
+#
+#  jump_table(size)[row][col] is a list of rays, one per direction that
+#  has room for a jump.  A ray lists the hops in order, each as
+#
+#     (to_row, to_col, over_row, over_col)
+#
+#  the square a jump of that many hops lands on and the square its last
+#  hop jumps over; a k-hop jump is legal when the (k-1)-hop jump is, that
+#  over square is full and the landing square empty.
+#
+#  jump_paths(size) maps every jump in the table, as (from_row, from_col,
+#  to_row, to_col), to (jump_over, jump_land): the squares jumped over and
+#  the intermediate squares landed on, as tuples of (row, col).  Moves
+#  that are not in it are not jumps on this board.
+#
+_tables = {}
+
+def _build_tables(size):
+    table = []
+    paths = {}
+    for row in range(size):
+        table.append([])
+        for col in range(size):
+            rays = []
+            for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                ray = []
+                jump_over, jump_land = [], []
+                to_row, to_col = row + 2*dr, col + 2*dc
+                while 0 <= to_row < size and 0 <= to_col < size:
+                    ray.append((to_row, to_col, to_row - dr, to_col - dc))
+                    jump_over.append((to_row - dr, to_col - dc))
+                    paths[(row, col, to_row, to_col)] = (tuple(jump_over),
+                                                         tuple(jump_land))
+                    jump_land.append((to_row, to_col))
+                    to_row, to_col = to_row + 2*dr, to_col + 2*dc
+                if ray: rays.append(ray)
+            table[row].append(rays)
+    _tables[size] = (table, paths)
+    return table, paths
+
+def jump_table(size):
+    tables = _tables.get(size) or _build_tables(size)
+    return tables[0]
+
+def jump_paths(size):
+    tables = _tables.get(size) or _build_tables(size)
+    return tables[1]
+
 #------------------------------------------------------------------------------
 # Determine whether a piece is moveable
 #
@@ -125,19 +320,20 @@ places = each_players_places()
 #
 # Returns None if there are no moves available from
 #   (from_row, from_col).
-#   
+#
 def moveable(from_row, from_col, b):
     if b[from_row][from_col] == ' ': return None
+    last = len(b) - 2
     if from_row > 1:
         if (not b[from_row-1][from_col] == ' ') and \
             (b[from_row-2][from_col] == ' '): return 1
-    if from_row < 6:
+    if from_row < last:
         if (not b[from_row+1][from_col] == ' ') and \
             (b[from_row+2][from_col] == ' '): return 1
     if from_col > 1:
         if (not b[from_row][from_col-1] == ' ') and \
             (b[from_row][from_col-2] == ' '): return 1
-    if from_col < 6:
+    if from_col < last:
         if (not b[from_row][from_col+1] == ' ') and \
             (b[from_row][from_col+2] == ' '): return 1
     return None
@@ -148,24 +344,13 @@ def moveable(from_row, from_col, b):
 #  Jumps must be vertical or horizontal, so either the x postion
 #  is the same (horizontal jump) or the y position is the same
 #
-#  lorow, lowcol  x,y for the lowest number row,col position
-#  hirow, hicol   x,y for the highest number row,col position
-#
-#  Returns two lists:
+#  Returns two tuples:
 #    (i,j) tuples of the jumped-over positions.
 #    (i,j) tuples of the intermediate landing positions
+#  or (None, None) if the move is not a jump on a size x size board.
 #
-def jumppath(lorow, locol, hirow, hicol):
-    if lorow == hirow:
-        jump_over = [(hirow, j) for j in range(locol+1, hicol, 2)]
-        jump_land = [(hirow, j) for j in range(locol+2, hicol, 2)]
-        return (jump_over, jump_land)
-    elif locol == hicol:
-        jump_over = [(i, hicol) for i in range(lorow+1, hirow, 2)]
-        jump_land = [(i, hicol) for i in range(lorow+2, hirow, 2)]
-        return (jump_over, jump_land)
-    else:
-        return (None, None)
+def jumppath(from_row, from_col, to_row, to_col, size=8):
+    return jump_paths(size).get((from_row, from_col, to_row, to_col), (None, None))
 
 #------------------------------------------------------------------------------
 # For one starting position, all possible jump destinations
@@ -173,44 +358,177 @@ def jumppath(lorow, locol, hirow, hicol):
 # (This is all possible destinations, regardless of whether
 #  they are possible jumps in the current game)
 #
-def dests_from(from_row, from_col):
+def dests_from(from_row, from_col, size=8):
     dests = []
-    for j in range(from_col%2, 8, 2):
+    for j in range(from_col%2, size, 2):
         if not j==from_col:
             dests.append((from_row, j))
-            
-    for i in range(from_row%2, 8, 2):
+
+    for i in range(from_row%2, size, 2):
         if not i==from_row:
             dests.append((i, from_col))
     return dests
 
 #------------------------------------------------------------------------------
-# Make successor node. 
-#   Input is curent board and the proposed move (from and to), 
+# Make successor node.
+#   Input is curent board and the proposed move (from and to),
 #   Output is one of these:
 #       The resulting new board, in a Node object (move is valid)
 #       None (the move is not possible)
 #
 def make_succ(b, mover, from_row, from_col, to_row, to_col):
-    if not b[to_row][to_col] == ' ': return None
-
-    locol, hicol = min(from_col, to_col), max(from_col, to_col)
-    lorow, hirow = min(from_row, to_row), max(from_row, to_row)
-
-    (jump_over, jump_land) = jumppath(lorow, locol, hirow, hicol)
+    (jump_over, jump_land) = jumppath(from_row, from_col, to_row, to_col, len(b))
     if not jump_over: return None
+    if not b[to_row][to_col] == ' ': return None
     for i,j in jump_over:
         if b[i][j] == ' ': return None
     for i,j in jump_land:
         if not b[i][j] == ' ': return None
+    return make_jump(b, mover, (from_row, from_col, to_row, to_col))
 
-    # Build a copy of the board, copying only those rows that are affected.
-    newb = b[:]
-    for i in range(lorow, hirow+1):
-        newb[i] = b[i][:]
-
+#------------------------------------------------------------------------------
+#  Place the move on the board.  Return None if move is not possible.
+#  If the move is possible, the board is modified.
+#
+#  Inputs are:
+#     board
+#     sq       the player in question, 'x' or 'o'
+#     othersq  the player being jumped over
+#     from_row
+#     from_col
+#     to_row
+#     to_col
+#
+#  make_move leaves . (dot) in place of the removed pieces, and
+#  capitalizes the moved piece for emphasis.  cleanup_move() is
+#  called to clean this stuff up after printing.
+#
+def make_move(board, sq, othersq, from_row, from_col, to_row, to_col):
+    (jump_over, jump_land) = jumppath(from_row, from_col, to_row, to_col, len(board))
+    if not jump_over: return None
+    if not board[from_row][from_col] == sq: return None
+    if not board[to_row][to_col] == ' ': return None
     for i,j in jump_over:
-        newb[i][j] = ' '
-    newb[to_row][to_col] = mover
-    newb[from_row][from_col] = ' '
-    return Node(newb, mover, (from_row, from_col, to_row, to_col))
+        if not board[i][j] == othersq: return None
+    for i,j in jump_land:
+        if not board[i][j] == ' ': return None
+    for i,j in jump_over:
+        board[i][j] = '.'
+    for i,j in jump_land:
+        board[i][j] = '.'
+    board[to_row][to_col] = sq.capitalize()
+    board[from_row][from_col] = '.'
+    return 1
+
+#  Cleanup_move cleans out the emphasis characters left by make_move
+#
+def cleanup_move(b):
+    for i in range(len(b)):
+        for j in range(len(b[i])):
+            char = b[i][j]
+            if char == '.' or char == '*':
+                b[i][j] = ' '
+            else:
+                b[i][j] = b[i][j].lower()
+
+#------------------------------------------------------------------------------
+#  Flat boards and packed moves
+#
+#  A flat board is a bytes or bytearray of size*size squares, row by row,
+#  holding EMPTY, ord('x') or ord('o'); 64 bytes for the standard board,
+#  one object where the list-of-lists board is size + 1.  A move is
+#
+#     from_square * size*size + to_square     (square = row * size + col)
+#
+#  which is konaneorder.move_index of the four-number move and fits in
+#  an unsigned short ('H') on boards up to 16x16.
+#
+#  The flat routines produce the same moves in the same order as jumps,
+#  so a move's index in the list is the same either way.  Their tables
+#  come from jump_table and board_places, flattened once per size.
+#
+EMPTY = ord(' ')
+
+_flat = {}
+
+#  (size, places, rays, over) for a flat board of 'squares' squares:
+#  places[mover] the mover's squares, rays[square] that square's rays as
+#  tuples of (to square, over square), over[move] the squares a packed
+#  move jumps over
+#
+def _flat_tables(squares):
+    tables = _flat.get(squares)
+    if tables is None:
+        size = math.isqrt(squares)
+        places = {p: [r * size + c for r, c in each_players_places(size)[p]]
+                  for p in ('x', 'o')}
+        rays = []
+        over = {}
+        for row, cells in enumerate(jump_table(size)):
+            for col, cellRays in enumerate(cells):
+                rays.append(tuple(tuple((tr * size + tc, orow * size + ocol)
+                                        for tr, tc, orow, ocol in ray)
+                                  for ray in cellRays))
+        for (fr, fc, tr, tc), (jump_over, jump_land) in jump_paths(size).items():
+            over[(fr * size + fc) * squares + tr * size + tc] = \
+                tuple(i * size + j for i, j in jump_over)
+        tables = _flat[squares] = (size, places, rays, over)
+    return tables
+
+def flatten(b):
+    return ''.join(''.join(row) for row in b).encode('ascii')
+
+def unflatten(flat):
+    size = math.isqrt(len(flat))
+    text = bytes(flat).decode('ascii')
+    return [list(text[i:i + size]) for i in range(0, len(text), size)]
+
+def pack_move(move, size=8):
+    from_row, from_col, to_row, to_col = move
+    return (from_row * size + from_col) * size * size + to_row * size + to_col
+
+def unpack_move(packed, size=8):
+    frm, to = divmod(packed, size * size)
+    return frm // size, frm % size, to // size, to % size
+
+def flat_jumps(fb, mover):
+    squares = len(fb)
+    size, places, rays, over = _flat_tables(squares)
+    for frm in places[mover]:
+        if fb[frm] == EMPTY: continue
+        base = frm * squares
+        for ray in rays[frm]:
+            for to, jumped in ray:
+                if fb[jumped] == EMPTY or fb[to] != EMPTY: break
+                yield base + to
+
+#  The board after a packed move from flat_jumps, as a new bytearray
+def flat_make(fb, mover, move):
+    new = bytearray(fb)
+    frm, to = divmod(move, len(fb))
+    for square in _flat_tables(len(fb))[3][move]:
+        new[square] = EMPTY
+    new[frm] = EMPTY
+    new[to] = ord(mover)
+    return new
+
+def flat_count(fb, mover):
+    squares = len(fb)
+    size, places, rays, over = _flat_tables(squares)
+    count = 0
+    for frm in places[mover]:
+        if fb[frm] == EMPTY: continue
+        for ray in rays[frm]:
+            for to, jumped in ray:
+                if fb[jumped] == EMPTY or fb[to] != EMPTY: break
+                count += 1
+    return count
+
+def flat_done(fb, mover):
+    for move in flat_jumps(fb, mover):
+        return None
+    return True
+
+#  Two bytes a move on boards up to 16x16, four beyond
+def move_array(fb, mover):
+    return array.array('H' if len(fb) <= 256 else 'I', flat_jumps(fb, mover))
@@ -0,0 +1,171 @@
+# One Konane object contains one player's information in a Konane game.
+#
+# The 'move' method returns your move.  Put your code there!
+#
+#  At initialization, save the initial state of the game, plus
+#  some other useful information:
+#    board = game board
+#    who = the current player 'o' or 'x'
+#    other = the other player 'x' or 'o'
+#
+#  This player is Monte Carlo tree search (UCT).  Each round walks down
+#  the tree from the root, choosing at every node the child with the best
+#  upper confidence bound
+#
+#     wins/visits + C * sqrt(ln(parent visits) / visits)
+#
+#  adds one new child at the bottom, and plays 'batch' random games from
+#  it at once with konanebatch.Playouts; every node on the way gets the
+#  games and wins.  After time_limit seconds it plays the most visited
+#  move.
+#
+#  The tree is kept between moves: the child for our move, and under it
+#  the child for the opponent's reply, if the search got that far,
+#  becomes the next root with its statistics.
+#
+#  After each move, self.playouts and self.playoutRate say how many
+#  random games were played and how many per second.
+#
+import math
+import time
+import konanebits as U
+import konanebatch as KB
+import konaneevents as EV
+
+TIME_LIMIT = 1.0
+BATCH = 256
+C = 1.4
+
+#  A node is the position after 'move' (a konanebits jump) was made by
+#  'mover'.  wins counts the random games won by mover.  key is the
+#  position's key with the other side to move; untried holds the moves
+#  from it that have no child yet (None until the node is first
+#  expanded).
+#
+class TreeNode:
+    def __init__(self, move, mover, key):
+        self.move = move
+        self.mover = mover
+        self.key = key
+        self.children = []
+        self.untried = None
+        self.wins = 0
+        self.visits = 0
+
+    def best_child(self, c):
+        logVisits = math.log(self.visits)
+        best = None
+        bestValue = -1.0
+        for child in self.children:
+            value = child.wins / child.visits + \
+                    c * math.sqrt(logVisits / child.visits)
+            if value > bestValue:
+                best, bestValue = child, value
+        return best
+
+class Konane:
+    def __init__(self, board, who, time_limit=TIME_LIMIT, batch=BATCH, c=C,
+                 seed=None):
+        self.board = board
+        self.who = who
+        self.other = {'x':'o', 'o':'x'}[who]
+        self.time_limit = time_limit
+        self.batch = batch
+        self.c = c
+        self.playouts = 0
+        self.playoutRate = 0.0
+        self.root = None
+        self.engine = KB.Playouts(len(board), seed)
+
+    #  Move command.  It should return a 4-tuple containing
+    #  the move that it thinks is best for the 'who' player
+    def move(self):
+        pos = U.Position(self.board)
+        mymoves = pos.moves(self.who)
+
+        # Optional for debugging: Print available moves
+        if EV.level >= EV.DETAIL:
+            EV.emit(EV.DETAIL, 'available', who=self.who,
+                    moves=[pos.move_tuple(m) for m in mymoves])
+
+        #--------------------------------------------------------------------------------------
+        # YOUR CODE REPLACES THIS SECTION
+        #
+        root = self.find_root(pos.key(self.who))
+        reused = root.visits
+        start = time.time()
+        self.playouts = 0
+        while 1:
+            self.playout_round(root, pos)
+            elapsed = time.time() - start
+            if elapsed >= self.time_limit or len(mymoves) == 1: break
+        self.playoutRate = self.playouts / elapsed if elapsed else 0.0
+
+        # Optional for debugging: print all the moves with their statistics
+        if EV.level >= EV.DETAIL:
+            EV.emit(EV.DETAIL, 'visits', who=self.who,
+                    children=[(pos.move_tuple(child.move), child.visits,
+                               child.wins / child.visits)
+                              for child in sorted(root.children, key=lambda n: -n.visits)])
+
+        best = max(root.children, key=lambda n: n.visits)
+        mymove = pos.move_tuple(best.move)
+        EV.emit(EV.MOVE, 'move', who=self.who, move=mymove, playouts=self.playouts,
+                rate=self.playoutRate, reused=reused)
+        self.root = best
+        #
+        # YOUR CODE ENDS HERE
+        #-------------------------------------------------------------------------
+
+        return mymove
+
+    #  The tree node for the position we are to move in: a grandchild of
+    #  the last root (our move, then the opponent's reply) if the search
+    #  reached it, otherwise a new tree.
+    def find_root(self, key):
+        if self.root:
+            for reply in self.root.children:
+                if reply.key == key:
+                    return reply
+        return TreeNode(None, self.other, key)
+
+    #  One round: select down to a leaf, expand it, play a batch of
+    #  random games from the new node, and back the results up.  pos is
+    #  the root position; it is restored before returning.
+    def playout_round(self, root, pos):
+        path = [root]
+        node = root
+        mover = self.who
+        while node.untried is not None and not node.untried and node.children:
+            node = node.best_child(self.c)
+            pos.make(node.mover, node.move)
+            path.append(node)
+            mover = U.OTHER[mover]
+
+        if node.untried is None:
+            node.untried = pos.moves(mover)
+        if node.untried:
+            m = node.untried.pop()
+            pos.make(mover, m)
+            child = TreeNode(m, mover, pos.key(U.OTHER[mover]))
+            node.children.append(child)
+            path.append(child)
+            node = child
+            mover = U.OTHER[mover]
+
+        games = self.batch
+        if pos.has_move(mover):
+            # Games won by 'mover', who moves first from here
+            won = self.engine.run(pos.bits, mover, games)
+            self.playouts += games
+        else:
+            won = 0
+
+        # node.mover made the last move, so won the games 'mover' lost
+        wins = games - won
+        for n in reversed(path):
+            n.visits += games
+            n.wins += wins
+            wins = games - wins
+        for n in path[:0:-1]:
+            pos.unmake(n.mover, n.move)
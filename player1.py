@@ -10,48 +10,50 @@
 #
 import random
 import konaneutils as U
+import konaneorder as O
+import konaneevents as EV
+import konanenegamax as N
 
-class Konane:
+#  The search itself, negamax, is konanenegamax's, shared with sps
+class Konane(N.FlatNegamax):
     def __init__(self, board, who):
         self.board = board
         self.who = who
         self.other = {'x':'o', 'o':'x'}[who]
+        self.order = O.MoveOrder(O.packed_index, size=len(board))
    
     #  Move command.  It should return a 4-tuple containing
     #  the move that it thinks is best for the 'who' player
     def move(self):
         # Optional debugging write
-        print("Score when move is called:" , self.simple_score(self.board))
+        if EV.level >= EV.DETAIL:
+            EV.emit(EV.DETAIL, 'score', who=self.who, score=self.simple_score(self.board))
 
         # All possible moves I can make
         mymoves = U.genmoves(self.board, self.who)
 
         # Optional for debugging: Print available moves
-        print("Available moves")
-        for n in mymoves:
-            print(n.mover, "moves ", n.move)
+        if EV.level >= EV.DETAIL:
+            EV.emit(EV.DETAIL, 'available', who=self.who, moves=[n.move for n in mymoves])
 
         #--------------------------------------------------------------------------------------
         # YOUR CODE REPLACES THIS SECTION
         #
         # random.shuffle(mymoves)          # Use this to pick a random move
         # mymove = mymoves[-1].move        #   instead of the code below.
-        newMoves = [(self.minimax(self.who, n, -1000, 1000, 0, 3), n.move) for n in mymoves]
-        newMoves = sorted(newMoves)
-        # Make a list of (score, move) tuples for each of the
-        #  possible successor boards
-        movesWithScore = [(self.simple_score(n.b), n.move) for n in mymoves]
+        self.order.new_search()
+        newMoves = [(-self.negamax(self.other, U.flatten(n.b), -N.INF, N.INF, 0, 3), n.move)
+                    for n in mymoves]
 
         # Sort will put in order of the score (the first item in each tuple)
-        movesWithScore = sorted(movesWithScore)
+        newMoves = sorted(newMoves)
 
         # Optional for debugging: print all the available moves with their scores
-        for x in movesWithScore:
-            print("Scored move", x)
+        EV.emit(EV.DETAIL, 'scores', who=self.who, scores=newMoves)
 
         # Extract the move from the tuple at the end of the list (highest score)
-        myscore, mymove =movesWithScore[-1]
-        print(self.who, "picked move", mymove, "with score", myscore)
+        myscore, mymove = newMoves[-1]
+        EV.emit(EV.MOVE, 'move', who=self.who, move=mymove, score=myscore)
         #
         # YOUR CODE ENDS HERE
         #-------------------------------------------------------------------------
@@ -63,35 +65,13 @@ class Konane:
     #
     # Compute the number of moves available for the 'who' player, minus the
     # number of moves available for the 'other' player.
-    # Exception: if this position is a win or a loss, return +/- 1000
+    # Exception: if this position is a win or a loss, negamax returns
+    # +/- konanenegamax.WIN
     #
     # YOU MIGHT HAVE A MORE SOPHISTICATED SCORING FUNCTION
     #
     def simple_score(self, board):
-        return len(U.genmoves(board, self.who)) - len(U.genmoves(board, self.other))
+        return U.count_moves(board, self.who) - U.count_moves(board, self.other)
 
     def gameDone(self, mover):
         return U.gameDone(self.board, mover)
-
-    def minimax(self, who, board, alpha, beta, ran, depth):
-        if ran == depth or self.gameDone(who):
-            return self.simple_score(board.b)
-        moves = U.genmoves(board.b, who)
-        temp = 5
-        if who == self.who:
-            for x in moves:
-                s = ran + 1
-                cScore = self.minimax(self.other, x, alpha, beta, s, depth)
-                setScore = max(cScore, alpha)
-                alpha = setScore
-                temp = alpha
-                if alpha >= beta: break
-        else:
-            for x in moves:
-                s = ran + 1
-                cScore = self.minimax(self.who, x, alpha, beta, s, depth)
-                setScore = min(cScore, beta)
-                beta = setScore
-                temp = beta
-                if beta <= alpha: break
-        return temp  